@@ -15,17 +15,18 @@ echo -e "${BLUE}========================================${NC}"
 echo -e "\n${YELLOW}Stopping any existing GPU bridge processes...${NC}"
 pkill -f "ollama-gpu-bridge.py" 2>/dev/null
 pkill -f "main.*gguf" 2>/dev/null
+pkill -f "llama-server.*gguf" 2>/dev/null
 sleep 2
 
 # Check Python and required packages
 echo -e "\n${BLUE}1. Checking Python setup:${NC}"
 python3 --version
-if python3 -c "import flask, flask_cors" 2>/dev/null; then
-    echo -e "${GREEN}✓ Flask and flask-cors installed${NC}"
+if python3 -c "import flask, flask_cors, requests" 2>/dev/null; then
+    echo -e "${GREEN}✓ Flask, flask-cors and requests installed${NC}"
 else
     echo -e "${RED}✗ Flask not installed${NC}"
     echo "Installing Flask..."
-    pip install flask flask-cors
+    pip install flask flask-cors requests
 fi
 
 # Check llama.cpp binary
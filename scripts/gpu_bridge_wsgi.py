@@ -0,0 +1,30 @@
+"""
+WSGI entry point for the Ollama GPU bridge (v2)
+
+Serves the bridge from gunicorn's gevent worker so waits on llama-server
+streams yield to other requests instead of tying up one OS thread each.
+Use a single worker: every worker would otherwise start its own llama-server
+processes and load each model again.
+
+    cd scripts
+    gunicorn -k gevent -w 1 --worker-connections 64 -b 127.0.0.1:11434 gpu_bridge_wsgi:app
+"""
+
+# Patch sockets, threading and subprocess before anything else imports them
+from gevent import monkey
+monkey.patch_all()
+
+import importlib.util
+from pathlib import Path
+
+# The bridge script has a dashed filename, so load it by path
+_spec = importlib.util.spec_from_file_location(
+    "ollama_gpu_bridge_v2",
+    Path(__file__).with_name("ollama-gpu-bridge-v2.py")
+)
+bridge = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bridge)
+
+# watchdog's inotify thread would block the gevent hub, so keep per-request mtime checks
+bridge.init_bridge(watch_models=False)
+app = bridge.app
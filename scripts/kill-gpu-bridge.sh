@@ -6,10 +6,13 @@ echo "Killing all GPU bridge processes..."
 # Kill Python GPU bridge (both versions)
 pkill -f "ollama-gpu-bridge.py" 2>/dev/null && echo "  - Stopped GPU bridge"
 pkill -f "ollama-gpu-bridge-v2.py" 2>/dev/null && echo "  - Stopped GPU bridge v2"
+pkill -f "gpu_bridge_wsgi" 2>/dev/null && echo "  - Stopped GPU bridge (gunicorn)"
+pkill -f "nginx-gpu-bridge.conf" 2>/dev/null && echo "  - Stopped bridge proxy"
 
 # Kill any llama.cpp processes
 pkill -f "main.*gguf" 2>/dev/null && echo "  - Stopped llama.cpp main"
 pkill -f "llama-cli.*gguf" 2>/dev/null && echo "  - Stopped llama-cli"
+pkill -f "llama-server.*gguf" 2>/dev/null && echo "  - Stopped llama-server"
 
 # Kill any hanging curl or test processes
 pkill -f "curl.*11434" 2>/dev/null
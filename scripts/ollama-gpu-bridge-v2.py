@@ -1,24 +1,47 @@
 #!/data/data/com.termux/files/usr/bin/python3
 """
 Ollama-compatible API bridge for llama.cpp with GPU acceleration (v2)
-Simplified version using one-shot generation for reliability
+Keeps one persistent llama-server per model so weights and KV cache stay warm
 """
 
 import os
 import sys
+import atexit
 import json
 import time
+import random
+import re
+import signal
+import socket
+import struct
 import subprocess
 import hashlib
 import traceback
 import threading
-import uuid
+import functools
+from collections import defaultdict
 from pathlib import Path
-from typing import Optional, Dict, List, Generator
-from flask import Flask, request, jsonify, Response, stream_with_context
+from typing import Optional, Dict, List, Generator, Tuple
+import requests
+from flask import Flask, request, Response, stream_with_context
 from flask_cors import CORS
 import logging
 
+# orjson is optional; it is much faster than json for every response and streamed token
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# watchdog is optional; without it the models directories are checked on /api/tags polls
+# and on lookups that miss the registry
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
 # Configure logging to both file and console
 LOG_FILE = Path.home() / "PocketLLM" / "logs" / "gpu-bridge.log"
 LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -42,6 +65,9 @@ MODELS_DIR = Path.home() / "PocketLLM" / "models"
 OLLAMA_MODELS_DIR = Path.home() / ".ollama" / "models"
 CONFIG_DIR = Path.home() / ".ollama-bridge"
 
+# Listen port; set to 11435 when scripts/nginx-gpu-bridge.conf fronts the bridge on 11434
+BRIDGE_PORT = int(os.getenv('OLLAMA_BRIDGE_PORT', 11434))
+
 # Create directories if they don't exist
 try:
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
@@ -50,93 +76,243 @@ except Exception as e:
     logger.error(f"Failed to create directories: {e}")
     sys.exit(1)
 
-# Check if llama.cpp binary exists
-if not LLAMA_BIN.exists():
-    # Try alternative location (symlink)
-    LLAMA_BIN_ALT = Path.home() / "llama.cpp" / "build" / "bin" / "llama-cli"
-    if LLAMA_BIN_ALT.exists():
-        logger.info(f"Using alternative binary: {LLAMA_BIN_ALT}")
-        LLAMA_BIN = LLAMA_BIN_ALT
+# Check if llama-server binary exists
+LLAMA_SERVER_BIN = LLAMA_BIN.parent / "llama-server"
+if not LLAMA_SERVER_BIN.exists():
+    # Try alternative location (older builds name it "server")
+    LLAMA_SERVER_BIN_ALT = LLAMA_BIN.parent / "server"
+    if LLAMA_SERVER_BIN_ALT.exists():
+        logger.info(f"Using alternative binary: {LLAMA_SERVER_BIN_ALT}")
+        LLAMA_SERVER_BIN = LLAMA_SERVER_BIN_ALT
     else:
-        logger.error(f"llama.cpp binary not found at {LLAMA_BIN} or {LLAMA_BIN_ALT}")
+        logger.error(f"llama-server binary not found at {LLAMA_SERVER_BIN} or {LLAMA_SERVER_BIN_ALT}")
         logger.error("Please run: bash scripts/termux-gpu-setup.sh")
         sys.exit(1)
 
-# Default GPU settings
-DEFAULT_GPU_LAYERS = int(os.getenv('OLLAMA_GPU_LAYERS', 16))
-DEFAULT_THREADS = os.cpu_count() or 4
+def detect_performance_cores() -> int:
+    """Count the big cores on big.LITTLE CPUs, falling back to all logical cores"""
+    max_freqs = []
+    for freq_file in Path("/sys/devices/system/cpu").glob("cpu[0-9]*/cpufreq/cpuinfo_max_freq"):
+        try:
+            max_freqs.append(int(freq_file.read_text()))
+        except (OSError, ValueError):
+            continue
+            
+    if len(set(max_freqs)) > 1:
+        # Leave out the slowest (efficiency) cluster
+        slowest = min(max_freqs)
+        return sum(1 for freq in max_freqs if freq > slowest)
+    return os.cpu_count() or 4
+
+# Default GPU settings (OLLAMA_GPU_LAYERS pins the layer count, otherwise it is picked per model)
+GPU_LAYERS_OVERRIDE = os.getenv('OLLAMA_GPU_LAYERS')
+DEFAULT_GPU_LAYERS = int(GPU_LAYERS_OVERRIDE or 16)
+DEFAULT_THREADS = int(os.getenv('OLLAMA_NUM_THREAD', 0)) or detect_performance_cores()
+# Share of available RAM a model may use before GPU offload is scaled back (memory is shared on phones)
+GPU_MEMORY_FRACTION = 0.6
 DEFAULT_CONTEXT = 4096
 DEFAULT_MAX_TOKENS = 512
+# Prompt processing batch sizes (logical batch and physical micro-batch)
+DEFAULT_N_BATCH = int(os.getenv('OLLAMA_N_BATCH', 2048))
+DEFAULT_N_UBATCH = int(os.getenv('OLLAMA_N_UBATCH', 512))
+
+# llama-server settings (each server runs LLAMA_SERVER_SLOTS parallel decode slots)
+LLAMA_SERVER_HOST = "127.0.0.1"
+LLAMA_SERVER_SLOTS = int(os.getenv('OLLAMA_NUM_PARALLEL', 4))
+LLAMA_SERVER_STARTUP_TIMEOUT = 120
+
+# Max bytes per read from a streaming completion; llama-server sends chunked
+# responses, so a large value returns each chunk whole without waiting for more
+STREAM_READ_SIZE = 65536
 
 # Model registry (maps Ollama model names to GGUF files)
 MODEL_REGISTRY = {}
 
-def register_model_names(model_file: Path, path_str: str):
+# Partial-match index built by scan_models(): lowercase name -> (registration order, path),
+# plus a map from each 3-character shingle to the lowercase names containing it
+_LOWER_KEYS = {}
+_SUBSTR_INDEX = {}
+_SHORT_KEYS = []
+
+# Per-file metadata (maps model path to size, mtime, family, size label, chat formatter and aliases)
+MODEL_META = {}
+
+# Truncated SHA-256 digest of every registered name, computed once per scan
+_DIGEST_CACHE = {}
+
+def make_chat_template(role_prefix: Dict[str, str], turn_end: str, assistant_start: str):
+    """Build a prompt formatter from a chat format's role prefixes and turn terminator"""
+    def format_chat(messages: List[Dict]) -> str:
+        parts = []
+        for msg in messages:
+            # Messages with roles the format does not know are skipped
+            prefix = role_prefix.get(msg.get('role', 'user'))
+            if prefix:
+                parts.append(prefix)
+                parts.append(msg.get('content', ''))
+                parts.append(turn_end)
+        parts.append(assistant_start)
+        return "".join(parts)
+    return format_chat
+
+# Chat formats by template name, chosen per model at scan time. Prompting a model in
+# its own format lets it emit its end-of-turn token instead of rambling on.
+# llama-server adds BOS itself and stops on each format's end-of-turn token.
+_CHAT_TEMPLATES = {
+    "plain": make_chat_template(
+        {"system": "System: ", "user": "User: ", "assistant": "Assistant: "},
+        "\n\n", "Assistant: "
+    ),
+    "llama3": make_chat_template(
+        {
+            "system": "<|start_header_id|>system<|end_header_id|>\n\n",
+            "user": "<|start_header_id|>user<|end_header_id|>\n\n",
+            "assistant": "<|start_header_id|>assistant<|end_header_id|>\n\n"
+        },
+        "<|eot_id|>", "<|start_header_id|>assistant<|end_header_id|>\n\n"
+    ),
+    # TinyLlama chat uses the Zephyr format
+    "zephyr": make_chat_template(
+        {"system": "<|system|>\n", "user": "<|user|>\n", "assistant": "<|assistant|>\n"},
+        "</s>\n", "<|assistant|>\n"
+    ),
+    "phi3": make_chat_template(
+        {"system": "<|system|>\n", "user": "<|user|>\n", "assistant": "<|assistant|>\n"},
+        "<|end|>\n", "<|assistant|>\n"
+    ),
+    # Gemma has no system role, so system messages become user turns
+    "gemma": make_chat_template(
+        {"system": "<start_of_turn>user\n", "user": "<start_of_turn>user\n", "assistant": "<start_of_turn>model\n"},
+        "<end_of_turn>\n", "<start_of_turn>model\n"
+    ),
+    # Qwen uses ChatML
+    "chatml": make_chat_template(
+        {"system": "<|im_start|>system\n", "user": "<|im_start|>user\n", "assistant": "<|im_start|>assistant\n"},
+        "<|im_end|>\n", "<|im_start|>assistant\n"
+    )
+}
+
+# Classifies a model filename in one pass; the first matching branch names its family
+_MODEL_RE = re.compile(
+    r"(?P<tinyllama>tinyllama)|(?P<llama32>llama.*3\.2)|(?P<llama3>llama-?3)|(?P<llama>llama)"
+    r"|(?P<phi2>phi-?2)|(?P<phi>phi)|(?P<gemma>gemma)|(?P<qwen>qwen)|(?P<mistral>mistral)",
+    re.IGNORECASE
+)
+
+# Parameter count in a filename, e.g. "1.1b" or "3B"
+_SIZE_RE = re.compile(r"\b(\d+(?:\.\d+)?)b\b", re.IGNORECASE)
+
+# Family, fallback parameter size, chat template and Ollama-style aliases for each branch
+# of _MODEL_RE ("{size}" in an alias becomes the size label, e.g. "1b")
+_MODEL_FAMILIES = {
+    "tinyllama": {
+        "family": "tinyllama", "param_size": "1.1B", "template": "zephyr",
+        "aliases": ["tinyllama", "tinyllama:latest", "tinyllama:1b", "tinyllama:1.1b"]
+    },
+    "llama32": {
+        "family": "llama", "param_size": "1B", "template": "llama3",
+        "aliases": ["llama3.2:{size}", "llama3.2", "llama3:{size}", "llama3:latest", "llama3"]
+    },
+    "llama3": {
+        "family": "llama", "param_size": "1B", "template": "llama3",
+        "aliases": ["llama3", "llama3:latest", "llama3:{size}"]
+    },
+    # Also the fallback for files that match no branch
+    "llama": {
+        "family": "llama", "param_size": "1B", "template": "plain",
+        "aliases": []
+    },
+    "phi2": {
+        "family": "phi", "param_size": "2.7B", "template": "plain",
+        "aliases": ["phi", "phi:latest", "phi:2.7b"]
+    },
+    "phi": {
+        "family": "phi", "param_size": "3.8B", "template": "phi3",
+        "aliases": ["phi3:mini", "phi3:latest", "phi3", "phi"]
+    },
+    "gemma": {
+        "family": "gemma", "param_size": "2B", "template": "gemma",
+        "aliases": ["gemma:2b", "gemma:latest", "gemma"]
+    },
+    "qwen": {
+        "family": "qwen", "param_size": "1.8B", "template": "chatml",
+        "aliases": ["qwen:1.8b", "qwen:latest", "qwen:1.5b", "qwen2:1.5b", "qwen"]
+    },
+    "mistral": {
+        "family": "mistral", "param_size": "7B", "template": "plain",
+        "aliases": ["mistral:7b", "mistral:7b-instruct", "mistral:7b-instruct-v0.2", "mistral:latest", "mistral"]
+    }
+}
+
+# Dummy embedding returned by the /api/embeddings stub, generated once at startup
+EMBEDDING_DIM = 384
+_STUB_EMBEDDING = [random.random() for _ in range(EMBEDDING_DIM)]
+
+# Cached /api/tags response, rebuilt only when a models directory or model file changes
+_MODELS_CACHE = {"state": None, "payload": None, "lock": threading.Lock()}
+
+# Bumped by scan_models() after each swap, so memoized lookups from an older registry go unused
+_REGISTRY_VERSION = 0
+
+# watchdog observer that keeps the registry fresh off the request path (None if not running)
+MODEL_OBSERVER = None
+
+# Seconds without further .gguf events before the watcher rescans (downloads write continuously)
+MODEL_EVENT_DEBOUNCE = 1.0
+
+# Persistent llama-server processes (maps model path to (process, port, slots)); slots
+# bounds in-flight generations on that server so extra requests queue here instead of
+# exhausting memory, without one model's backlog blocking another's
+LLAMA_SERVERS = {}
+LLAMA_SERVERS_LOCK = threading.Lock()
+# Per-model locks held while that model's llama-server starts
+LLAMA_STARTUP_LOCKS = {}
+# -ngl each running llama-server was started with (maps model path to layer count)
+LLAMA_SERVER_GPU_LAYERS = {}
+
+# Shared HTTP session so calls to llama-server reuse keep-alive connections
+LLAMA_HTTP = requests.Session()
+LLAMA_HTTP.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=LLAMA_SERVER_SLOTS))
+
+def register_model_names(registry: Dict[str, str], model_file: Path, path_str: str, aliases: List[str]):
     """Register a model with multiple name variations"""
-    global MODEL_REGISTRY
-    
-    filename = model_file.name
     stem = model_file.stem
     stem_lower = stem.lower()
     
-    # Register with multiple name variations
-    MODEL_REGISTRY[filename] = path_str
-    MODEL_REGISTRY[stem] = path_str
-    MODEL_REGISTRY[stem_lower] = path_str
-    
-    # Simplified names
-    simple_name = stem_lower.replace("-", "_").replace(".", "_")
-    MODEL_REGISTRY[simple_name] = path_str
-    
-    # Create Ollama-style names based on model type
-    if "tinyllama" in stem_lower:
-        MODEL_REGISTRY["tinyllama"] = path_str
-        MODEL_REGISTRY["tinyllama:latest"] = path_str
-        MODEL_REGISTRY["tinyllama:1b"] = path_str
-        MODEL_REGISTRY["tinyllama:1.1b"] = path_str
-        
-    if "llama" in stem_lower and "3.2" in stem_lower:
-        MODEL_REGISTRY["llama3.2:1b"] = path_str
-        MODEL_REGISTRY["llama3.2"] = path_str
-        MODEL_REGISTRY["llama3:latest"] = path_str
-        MODEL_REGISTRY["llama3"] = path_str
-        
-    if "llama3" in stem_lower:
-        MODEL_REGISTRY["llama3"] = path_str
-        MODEL_REGISTRY["llama3:latest"] = path_str
-        if "1b" in stem_lower:
-            MODEL_REGISTRY["llama3:1b"] = path_str
-            MODEL_REGISTRY["llama3.2:1b"] = path_str
-            
-    if "phi" in stem_lower:
-        MODEL_REGISTRY["phi3:mini"] = path_str
-        MODEL_REGISTRY["phi3:latest"] = path_str
-        MODEL_REGISTRY["phi3"] = path_str
-        MODEL_REGISTRY["phi"] = path_str
-        
-    if "gemma" in stem_lower:
-        MODEL_REGISTRY["gemma:2b"] = path_str
-        MODEL_REGISTRY["gemma:latest"] = path_str
-        MODEL_REGISTRY["gemma"] = path_str
-        
-    if "qwen" in stem_lower:
-        MODEL_REGISTRY["qwen:1.8b"] = path_str
-        MODEL_REGISTRY["qwen:latest"] = path_str
-        MODEL_REGISTRY["qwen:1.5b"] = path_str
-        MODEL_REGISTRY["qwen2:1.5b"] = path_str
-        MODEL_REGISTRY["qwen"] = path_str
-        
-    if "mistral" in stem_lower:
-        MODEL_REGISTRY["mistral:7b"] = path_str
-        MODEL_REGISTRY["mistral:7b-instruct"] = path_str
-        MODEL_REGISTRY["mistral:7b-instruct-v0.2"] = path_str
-        MODEL_REGISTRY["mistral:latest"] = path_str
-        MODEL_REGISTRY["mistral"] = path_str
+    # Filename variations, a simplified name, then Ollama-style names for the model's
+    # family (classified once by model_metadata)
+    names = [model_file.name, stem, stem_lower, stem_lower.replace("-", "_").replace(".", "_")]
+    names.extend(aliases)
+    
+    # The first file registered keeps a shared name, so lookups do not depend on
+    # whichever file happened to be scanned last
+    registry.update((name, path_str) for name in names if name not in registry)
+
+def model_metadata(model_file: Path) -> Dict:
+    """Stat a model file once and classify its family, size and aliases from the filename"""
+    st = model_file.stat()
+    
+    # Determine model family and size
+    match = _MODEL_RE.search(model_file.name)
+    family = _MODEL_FAMILIES[match.lastgroup if match else "llama"]
+    size_match = _SIZE_RE.search(model_file.name)
+    param_size = f"{size_match.group(1)}B" if size_match else family["param_size"]
+    size_label = param_size.lower()
+    
+    return {
+        "size": st.st_size,
+        "modified_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(st.st_mtime)),
+        "family": family["family"],
+        "param_size": param_size,
+        "template": _CHAT_TEMPLATES[family["template"]],
+        "aliases": [alias.replace("{size}", size_label) for alias in family["aliases"]]
+    }
 
 def scan_models():
     """Scan for available GGUF models in both PocketLLM and Ollama directories"""
-    global MODEL_REGISTRY
-    MODEL_REGISTRY = {}
+    global MODEL_REGISTRY, MODEL_META, _LOWER_KEYS, _SUBSTR_INDEX, _SHORT_KEYS, _DIGEST_CACHE, _REGISTRY_VERSION
+    registry = {}
+    meta = {}
     
     directories_to_scan = []
     
@@ -150,26 +326,149 @@ def scan_models():
     if OLLAMA_MODELS_DIR.exists():
         directories_to_scan.append(("Ollama", OLLAMA_MODELS_DIR))
     
-    if not directories_to_scan:
-        logger.warning("No model directories found")
-        return
-    
     for source, directory in directories_to_scan:
-        # Scan recursively for .gguf files (Ollama stores in blobs subdirectory)
-        for model_file in directory.rglob("*.gguf"):
+        # Scan recursively for .gguf files (Ollama stores in blobs subdirectory), in a
+        # stable order so the first file to claim a shared alias is always the same
+        for model_file in sorted(directory.rglob("*.gguf")):
             path_str = str(model_file)
-            register_model_names(model_file, path_str)
+            try:
+                meta[path_str] = model_metadata(model_file)
+            except OSError as e:
+                logger.warning(f"Skipping unreadable model {model_file}: {e}")
+                continue
+            register_model_names(registry, model_file, path_str, meta[path_str]["aliases"])
             logger.debug(f"Found model from {source}: {model_file.name}")
+    
+    # Index lowercase names by 3-character shingles for partial matching
+    lower_keys = {}
+    substr_index = defaultdict(list)
+    short_keys = []
+    for key, path in registry.items():
+        key_lower = key.lower()
+        if key_lower in lower_keys:
+            continue
+        lower_keys[key_lower] = (len(lower_keys), path)
+        if len(key_lower) < 3:
+            short_keys.append(key_lower)
+        for shingle in {key_lower[i:i + 3] for i in range(len(key_lower) - 2)}:
+            substr_index[shingle].append(key_lower)
+    
+    digests = {name: hashlib.sha256(name.encode()).hexdigest()[:12] for name in registry}
+    
+    # Swap in the finished registry so concurrent lookups never see a partial one
+    MODEL_REGISTRY = registry
+    MODEL_META = meta
+    _DIGEST_CACHE = digests
+    _LOWER_KEYS, _SUBSTR_INDEX, _SHORT_KEYS = lower_keys, dict(substr_index), short_keys
+    _REGISTRY_VERSION += 1
+    
+    if not directories_to_scan:
+        logger.warning("No model directories found")
+        return
         
     logger.info(f"Found {len(set(MODEL_REGISTRY.values()))} unique models with {len(MODEL_REGISTRY)} name mappings")
     logger.info(f"Scanned directories: {[str(d[1]) for d in directories_to_scan]}")
 
+def model_digest(model_name: str) -> str:
+    """Return the short digest reported for a model name"""
+    digest = _DIGEST_CACHE.get(model_name)
+    if digest is None:
+        digest = hashlib.sha256(model_name.encode()).hexdigest()[:12]
+    return digest
+
+def models_dir_state() -> tuple:
+    """Return the mtime of every directory scan_models() walks and the size and mtime of every model"""
+    state = []
+    for directory in (MODELS_DIR, OLLAMA_MODELS_DIR):
+        # Adding or removing a file only touches its parent directory, so include subdirectories;
+        # rewriting a file in place does not, so the files themselves are included too
+        for root, dirs, files in os.walk(directory):
+            try:
+                state.append((root, os.stat(root).st_mtime_ns))
+            except OSError:
+                continue
+            for name in files:
+                if not name.endswith(".gguf"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                state.append((os.path.join(root, name), st.st_size, st.st_mtime_ns))
+    return tuple(state)
+
+def refresh_models(force: bool = False):
+    """Rescan models and rebuild the /api/tags payload if a models directory or file changed"""
+    state = models_dir_state()
+    if not force and state == _MODELS_CACHE["state"]:
+        return
+        
+    with _MODELS_CACHE["lock"]:
+        if not force and state == _MODELS_CACHE["state"]:
+            return
+        scan_models()
+        _MODELS_CACHE["payload"] = dumps_bytes({"models": build_model_list()})
+        _MODELS_CACHE["state"] = state
+
+class ModelDirHandler(FileSystemEventHandler):
+    """Refresh the model registry when a .gguf file appears, changes or goes away"""
+    
+    def __init__(self):
+        super().__init__()
+        self._timer = None
+        self._timer_lock = threading.Lock()
+    
+    def on_any_event(self, event):
+        if event.event_type not in ("created", "deleted", "modified", "moved"):
+            return
+        paths = (event.src_path, getattr(event, "dest_path", ""))
+        if any(str(path).endswith(".gguf") for path in paths):
+            self.schedule_refresh()
+            
+    def schedule_refresh(self):
+        """Force a rescan once events stop arriving for MODEL_EVENT_DEBOUNCE seconds"""
+        # Writing to an existing file leaves directory mtimes unchanged, so the rescan
+        # is forced; restarting the timer coalesces the events of a download into one
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(MODEL_EVENT_DEBOUNCE, refresh_models, kwargs={"force": True})
+            self._timer.daemon = True
+            self._timer.start()
+
+def start_model_watcher() -> bool:
+    """Watch the models directories in a background thread; returns False if unavailable"""
+    global MODEL_OBSERVER
+    if Observer is None:
+        return False
+        
+    observer = Observer()
+    observer.daemon = True
+    handler = ModelDirHandler()
+    for directory in (MODELS_DIR, OLLAMA_MODELS_DIR):
+        if directory.exists():
+            observer.schedule(handler, str(directory), recursive=True)
+    observer.start()
+    MODEL_OBSERVER = observer
+    return True
+
 def get_model_path(model_name: str) -> Optional[str]:
     """Get the actual model path from a model name"""
-    # Refresh registry if empty
-    if not MODEL_REGISTRY:
-        scan_models()
+    # Refresh registry if empty; a running watcher refreshes it on its own
+    if not MODEL_REGISTRY and MODEL_OBSERVER is None:
+        refresh_models()
         
+    path = resolve_model_path(model_name, _REGISTRY_VERSION)
+    if path is None and MODEL_OBSERVER is None:
+        # Without a watcher, a miss may be a model added since the last scan; only misses
+        # pay for checking the directories, not every request
+        refresh_models()
+        path = resolve_model_path(model_name, _REGISTRY_VERSION)
+    return path
+
+@functools.lru_cache(maxsize=1024)
+def resolve_model_path(model_name: str, version: int) -> Optional[str]:
+    """Resolve a model name against the current registry (memoized per registry version)"""
     # Try direct lookup
     if model_name in MODEL_REGISTRY:
         return MODEL_REGISTRY[model_name]
@@ -202,10 +501,9 @@ def get_model_path(model_name: str) -> Optional[str]:
             return MODEL_REGISTRY[f"{base_name}:latest"]
             
     # Try partial matches
-    for key, path in MODEL_REGISTRY.items():
-        if model_name.lower() in key.lower() or key.lower() in model_name.lower():
-            logger.info(f"Partial match: {model_name} -> {key} -> {path}")
-            return path
+    path = find_partial_match(model_lower)
+    if path:
+        return path
             
     # Check if it's a direct file path
     model_path = MODELS_DIR / model_name
@@ -221,6 +519,279 @@ def get_model_path(model_name: str) -> Optional[str]:
     logger.debug(f"Available models: {list(MODEL_REGISTRY.keys())}")
     return None
 
+def find_partial_match(model_lower: str) -> Optional[str]:
+    """Find the first registered name that contains, or is contained in, model_lower"""
+    if len(model_lower) < 3:
+        # Too short to shingle, so every name is a candidate
+        candidates = _LOWER_KEYS.keys()
+    else:
+        # Any name sharing a substring with model_lower shares at least one shingle with it
+        candidates = set(_SHORT_KEYS)
+        for i in range(len(model_lower) - 2):
+            candidates.update(_SUBSTR_INDEX.get(model_lower[i:i + 3], ()))
+    
+    # Check candidates in registration order so results match a full registry scan
+    for key in sorted(candidates, key=lambda k: _LOWER_KEYS[k][0]):
+        if model_lower in key or key in model_lower:
+            path = _LOWER_KEYS[key][1]
+            logger.info(f"Partial match: {model_lower} -> {key} -> {path}")
+            return path
+    return None
+
+# GGUF metadata value types with a fixed size in bytes
+GGUF_SCALAR_SIZES = {0: 1, 1: 1, 2: 2, 3: 2, 4: 4, 5: 4, 6: 4, 7: 1, 10: 8, 11: 8, 12: 8}
+GGUF_TYPE_STRING = 8
+GGUF_TYPE_ARRAY = 9
+
+def skip_gguf_value(f, value_type: int):
+    """Seek past one GGUF metadata value"""
+    if value_type == GGUF_TYPE_STRING:
+        length, = struct.unpack("<Q", f.read(8))
+        f.seek(length, os.SEEK_CUR)
+    elif value_type == GGUF_TYPE_ARRAY:
+        item_type, count = struct.unpack("<IQ", f.read(12))
+        if item_type in GGUF_SCALAR_SIZES:
+            f.seek(GGUF_SCALAR_SIZES[item_type] * count, os.SEEK_CUR)
+        else:
+            for _ in range(count):
+                skip_gguf_value(f, item_type)
+    else:
+        f.seek(GGUF_SCALAR_SIZES[value_type], os.SEEK_CUR)
+
+def read_gguf_block_count(model_path: str) -> Optional[int]:
+    """Read the layer count (<arch>.block_count) from a GGUF file header"""
+    try:
+        with open(model_path, "rb") as f:
+            magic, version = struct.unpack("<4sI", f.read(8))
+            if magic != b"GGUF" or version < 2:
+                return None
+            tensor_count, kv_count = struct.unpack("<QQ", f.read(16))
+            
+            for _ in range(kv_count):
+                key_length, = struct.unpack("<Q", f.read(8))
+                key = f.read(key_length).decode("utf-8", "replace")
+                value_type, = struct.unpack("<I", f.read(4))
+                
+                if key.endswith(".block_count") and value_type in (4, 5, 10, 11):
+                    size = GGUF_SCALAR_SIZES[value_type]
+                    return int.from_bytes(f.read(size), "little", signed=value_type in (5, 11))
+                if key.startswith("tokenizer."):
+                    # Architecture keys are written before the large tokenizer tables
+                    return None
+                skip_gguf_value(f, value_type)
+    except (OSError, struct.error, KeyError) as e:
+        logger.debug(f"Could not read GGUF header of {model_path}: {e}")
+    return None
+
+def available_memory() -> Optional[int]:
+    """Return MemAvailable from /proc/meminfo in bytes"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def gpu_layers_for(model_path: str) -> int:
+    """Pick -ngl for a model: full offload if it fits in memory, otherwise a proportional share"""
+    if GPU_LAYERS_OVERRIDE is not None:
+        return DEFAULT_GPU_LAYERS
+        
+    n_layer = read_gguf_block_count(model_path)
+    if not n_layer:
+        return DEFAULT_GPU_LAYERS
+        
+    budget = available_memory()
+    model_size = os.path.getsize(model_path)
+    if budget is None or model_size <= budget * GPU_MEMORY_FRACTION:
+        # Every repeating layer plus the output layer
+        return n_layer + 1
+        
+    # Partial offload; keep at least one layer on the CPU threads
+    return max(0, min(n_layer - 1, int(n_layer * budget * GPU_MEMORY_FRACTION / model_size)))
+
+def find_free_port() -> int:
+    """Ask the OS for an unused localhost port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((LLAMA_SERVER_HOST, 0))
+        return sock.getsockname()[1]
+
+def wait_for_llama_server(process: subprocess.Popen, port: int):
+    """Block until llama-server has loaded its model and reports healthy"""
+    url = f"http://{LLAMA_SERVER_HOST}:{port}/health"
+    deadline = time.time() + LLAMA_SERVER_STARTUP_TIMEOUT
+    
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"llama-server exited with code {process.returncode}")
+        try:
+            # llama-server answers 503 while the model is still loading
+            if LLAMA_HTTP.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+        
+    raise RuntimeError(f"llama-server did not become ready within {LLAMA_SERVER_STARTUP_TIMEOUT}s")
+
+def running_llama_server(model_path: str) -> Optional[Tuple[int, threading.BoundedSemaphore]]:
+    """Return the port and slots of a model's llama-server if it is running (forgetting it if it exited)"""
+    with LLAMA_SERVERS_LOCK:
+        if model_path in LLAMA_SERVERS:
+            process, port, slots = LLAMA_SERVERS[model_path]
+            if process.poll() is None:
+                return port, slots
+            logger.warning(f"llama-server for {Path(model_path).name} exited, restarting")
+            del LLAMA_SERVERS[model_path]
+            LLAMA_SERVER_GPU_LAYERS.pop(model_path, None)
+        return None
+
+def start_llama_server(model_path: str) -> Tuple[int, threading.BoundedSemaphore]:
+    """Start a persistent llama-server for a model (or reuse it) and return its port and slots"""
+    server = running_llama_server(model_path)
+    if server is not None:
+        return server
+        
+    # Serialize startup per model, without holding LLAMA_SERVERS_LOCK over the load, so
+    # requests for models that are already running are never stuck behind it
+    with LLAMA_SERVERS_LOCK:
+        startup_lock = LLAMA_STARTUP_LOCKS.setdefault(model_path, threading.Lock())
+    with startup_lock:
+        # Another request may have started it while this one waited
+        server = running_llama_server(model_path)
+        if server is not None:
+            return server
+            
+        port = find_free_port()
+        gpu_layers = gpu_layers_for(model_path)
+        cmd = [
+            str(LLAMA_SERVER_BIN),
+            "-m", model_path,
+            "-ngl", str(gpu_layers),
+            "-t", str(DEFAULT_THREADS),
+            # Context is shared between slots, so size it per slot
+            "-c", str(DEFAULT_CONTEXT * LLAMA_SERVER_SLOTS),
+            "-b", str(DEFAULT_N_BATCH),
+            "-ub", str(DEFAULT_N_UBATCH),
+            "-np", str(LLAMA_SERVER_SLOTS),
+            "-cb",
+            "--host", LLAMA_SERVER_HOST,
+            "--port", str(port)
+        ]
+        
+        logger.info(f"Starting llama-server: {' '.join(cmd)}")
+        
+        # Send server output to its own log file so an unread pipe can never fill up.
+        # Run it in its own session so a Ctrl+C aimed at the bridge does not hit it
+        # mid-request, and keep the bridge's listening socket out of the child.
+        server_log = LOG_FILE.parent / f"llama-server-{Path(model_path).stem}.log"
+        with open(server_log, "ab") as log:
+            process = subprocess.Popen(
+                cmd,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                start_new_session=True,
+                close_fds=True,
+                pass_fds=()
+            )
+        
+        try:
+            wait_for_llama_server(process, port)
+        except Exception:
+            terminate_process_group(process)
+            process.wait()
+            raise
+        
+        logger.info(f"llama-server ready on port {port} for {Path(model_path).name}")
+        slots = threading.BoundedSemaphore(LLAMA_SERVER_SLOTS)
+        with LLAMA_SERVERS_LOCK:
+            LLAMA_SERVERS[model_path] = (process, port, slots)
+            LLAMA_SERVER_GPU_LAYERS[model_path] = gpu_layers
+        return port, slots
+
+def terminate_process_group(process: subprocess.Popen, sig: int = signal.SIGTERM):
+    """Signal a child started with start_new_session and everything it spawned"""
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        pass
+
+def stop_llama_servers():
+    """Terminate all persistent llama-server processes"""
+    with LLAMA_SERVERS_LOCK:
+        for process, port, slots in LLAMA_SERVERS.values():
+            if process.poll() is None:
+                terminate_process_group(process)
+        for process, port, slots in LLAMA_SERVERS.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                terminate_process_group(process, signal.SIGKILL)
+                process.wait()
+        LLAMA_SERVERS.clear()
+        LLAMA_SERVER_GPU_LAYERS.clear()
+
+def completion_payload(
+    prompt: str,
+    max_tokens: int,
+    temperature: float,
+    top_p: float,
+    top_k: int,
+    repeat_penalty: float,
+    seed: Optional[int],
+    stream: bool
+) -> Dict:
+    """Build the llama-server /completion request body"""
+    payload = {
+        "prompt": prompt,
+        "n_predict": max_tokens,
+        "temperature": temperature,
+        "top_p": top_p,
+        "top_k": top_k,
+        "repeat_penalty": repeat_penalty,
+        "stream": stream,
+        # Let the server pick a free slot and reuse its KV cache for a matching prefix
+        "cache_prompt": True,
+        "id_slot": -1
+    }
+    
+    if seed is not None:
+        payload["seed"] = seed
+    return payload
+
+def run_llama_completion(
+    model_path: str,
+    prompt: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: float = 0.7,
+    top_p: float = 0.9,
+    top_k: int = 40,
+    repeat_penalty: float = 1.1,
+    seed: Optional[int] = None
+) -> Dict:
+    """Run a non-streaming completion and return llama-server's JSON response"""
+    payload = completion_payload(
+        prompt, max_tokens, temperature, top_p, top_k, repeat_penalty, seed, stream=False
+    )
+    
+    try:
+        port, slots = start_llama_server(model_path)
+        url = f"http://{LLAMA_SERVER_HOST}:{port}/completion"
+        logger.debug(f"POST {url} (n_predict={max_tokens}, stream=False)")
+        
+        with slots:
+            resp = LLAMA_HTTP.post(url, json=payload)
+        resp.raise_for_status()
+        return loads_json(resp.content)
+        
+    except Exception as e:
+        logger.error(f"Error running llama.cpp: {e}")
+        logger.error(traceback.format_exc())
+        return {"content": f"Error: {str(e)}", "tokens_predicted": 0}
+
 def run_llama_generation(
     model_path: str, 
     prompt: str, 
@@ -229,77 +800,38 @@ def run_llama_generation(
     top_p: float = 0.9,
     top_k: int = 40,
     repeat_penalty: float = 1.1,
-    seed: Optional[int] = None,
-    stream: bool = True
+    seed: Optional[int] = None
 ) -> Generator[str, None, None]:
-    """Run llama.cpp to generate text"""
-    
-    cmd = [
-        str(LLAMA_BIN),
-        "-m", model_path,
-        "-ngl", str(DEFAULT_GPU_LAYERS),
-        "-t", str(DEFAULT_THREADS),
-        "-c", str(DEFAULT_CONTEXT),
-        "-n", str(max_tokens),
-        "--temp", str(temperature),
-        "--top-p", str(top_p),
-        "--top-k", str(top_k),
-        "--repeat-penalty", str(repeat_penalty),
-        "-p", prompt,
-        "--simple-io",
-        "--no-display-prompt"
-    ]
-    
-    if seed is not None:
-        cmd.extend(["-s", str(seed)])
-    
-    logger.debug(f"Running command: {' '.join(cmd[:10])}...")
+    """Stream text from the model's persistent llama-server"""
+    payload = completion_payload(
+        prompt, max_tokens, temperature, top_p, top_k, repeat_penalty, seed, stream=True
+    )
     
     try:
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
+        port, slots = start_llama_server(model_path)
+        url = f"http://{LLAMA_SERVER_HOST}:{port}/completion"
+        logger.debug(f"POST {url} (n_predict={max_tokens})")
         
-        # Stream output line by line
-        full_response = []
-        for line in iter(process.stdout.readline, ''):
-            if line:
-                line = line.rstrip()
-                # Skip system messages and prompts
-                if not line.startswith("system_info:") and not line.startswith("main:"):
-                    full_response.append(line)
-                    if stream:
-                        yield line + "\n"
-        
-        # Wait for process to complete
-        process.wait()
-        
-        # If not streaming, return full response
-        if not stream:
-            yield "\n".join(full_response)
+        with slots, LLAMA_HTTP.post(url, json=payload, stream=True) as resp:
+            resp.raise_for_status()
             
-        # Check for errors
-        if process.returncode != 0:
-            stderr = process.stderr.read()
-            logger.error(f"llama.cpp error: {stderr}")
+            # Stream server-sent events token by token (lines stay bytes; the JSON parser decodes UTF-8)
+            for line in resp.iter_lines(chunk_size=STREAM_READ_SIZE):
+                if not line.startswith(b"data: "):
+                    continue
+                chunk = loads_json(line[6:])
+                if chunk.get("content"):
+                    yield chunk["content"]
+                if chunk.get("stop"):
+                    break
             
     except Exception as e:
         logger.error(f"Error running llama.cpp: {e}")
         logger.error(traceback.format_exc())
         yield f"Error: {str(e)}"
 
-# API Routes
-
-@app.route('/api/tags', methods=['GET'])
-@app.route('/api/models', methods=['GET'])
-def list_models():
-    """List available models (Ollama compatible)"""
-    scan_models()
-    
+def build_model_list() -> List[Dict]:
+    """Build the Ollama-style model list for the current registry"""
     models = []
     seen_files = {}
     
@@ -312,50 +844,22 @@ def list_models():
             elif path not in seen_files:
                 seen_files[path] = name
     
-    # Create model entries
+    # Create model entries from metadata gathered at scan time
     for path, preferred_name in seen_files.items():
-        model_file = Path(path)
-        if model_file.exists():
-            size = model_file.stat().st_size
-            modified = model_file.stat().st_mtime
-            
-            # Determine model family and size
-            filename_lower = model_file.name.lower()
-            family = "llama"
-            param_size = "1B"
-            
-            if "tinyllama" in filename_lower:
-                family = "tinyllama"
-                param_size = "1.1B"
-            elif "llama" in filename_lower:
-                family = "llama"
-                if "1b" in filename_lower:
-                    param_size = "1B"
-                elif "3b" in filename_lower:
-                    param_size = "3B"
-            elif "phi" in filename_lower:
-                family = "phi"
-                param_size = "3.8B"
-            elif "gemma" in filename_lower:
-                family = "gemma"
-                param_size = "2B"
-            elif "qwen" in filename_lower:
-                family = "qwen"
-                param_size = "1.8B"
-            
-            models.append({
-                "name": preferred_name,
-                "model": preferred_name,
-                "modified_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(modified)),
-                "size": size,
-                "digest": hashlib.sha256(preferred_name.encode()).hexdigest()[:12],
-                "details": {
-                    "format": "gguf",
-                    "family": family,
-                    "parameter_size": param_size,
-                    "quantization_level": "Q4_K_M"
-                }
-            })
+        meta = MODEL_META[path]
+        models.append({
+            "name": preferred_name,
+            "model": preferred_name,
+            "modified_at": meta["modified_at"],
+            "size": meta["size"],
+            "digest": model_digest(preferred_name),
+            "details": {
+                "format": "gguf",
+                "family": meta["family"],
+                "parameter_size": meta["param_size"],
+                "quantization_level": "Q4_K_M"
+            }
+        })
     
     # Add fake embedding model
     models.append({
@@ -371,8 +875,44 @@ def list_models():
             "quantization_level": "F16"
         }
     })
-                
-    return jsonify({"models": models})
+    
+    return models
+
+def dumps_bytes(obj) -> bytes:
+    """Serialize obj to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+def loads_json(data):
+    """Parse JSON from str or bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_response(obj) -> Response:
+    """Return obj as an application/json response (used in place of jsonify)"""
+    return Response(dumps_bytes(obj), mimetype='application/json')
+
+def sse_envelope(model_name: str, created_at: str, field: str) -> tuple:
+    """Precompute the bytes around a streamed chunk so only the chunk is encoded per token"""
+    prefix = (
+        b'data: {"model":' + dumps_bytes(model_name)
+        + b',"created_at":' + dumps_bytes(created_at)
+    )
+    if field == "message":
+        return prefix + b',"message":{"role":"assistant","content":', b'},"done":false}\n\n'
+    return prefix + b',"' + field.encode() + b'":', b',"done":false}\n\n'
+
+# API Routes
+
+@app.route('/api/tags', methods=['GET'])
+@app.route('/api/models', methods=['GET'])
+def list_models():
+    """List available models (Ollama compatible)"""
+    if MODEL_OBSERVER is None:
+        refresh_models()
+    return Response(_MODELS_CACHE["payload"], mimetype='application/json')
 
 @app.route('/api/show', methods=['POST'])
 def show_model():
@@ -382,10 +922,10 @@ def show_model():
     
     model_path = get_model_path(model_name)
     if not model_path:
-        return jsonify({"error": f"Model {model_name} not found"}), 404
+        return json_response({"error": f"Model {model_name} not found"}), 404
     
     model_file = Path(model_path)
-    return jsonify({
+    return json_response({
         "license": "Apache 2.0",
         "modelfile": f"FROM {model_file.name}",
         "parameters": "temperature 0.7\ntop_k 40\ntop_p 0.9",
@@ -418,94 +958,66 @@ def chat():
     # Get model path
     model_path = get_model_path(model_name)
     if not model_path:
-        return jsonify({"error": f"Model {model_name} not found"}), 404
-    
-    # Format messages into a prompt
-    prompt = ""
-    for msg in messages:
-        role = msg.get('role', 'user')
-        content = msg.get('content', '')
-        
-        if role == 'system':
-            prompt += f"System: {content}\n\n"
-        elif role == 'user':
-            prompt += f"User: {content}\n\n"
-        elif role == 'assistant':
-            prompt += f"Assistant: {content}\n\n"
+        return json_response({"error": f"Model {model_name} not found"}), 404
     
-    # Add final assistant marker
-    prompt += "Assistant: "
+    # Format messages into a prompt using the model's chat format
+    meta = MODEL_META.get(model_path)
+    format_chat = meta["template"] if meta else _CHAT_TEMPLATES["plain"]
+    prompt = format_chat(messages)
     
     logger.info(f"Chat request - Model: {model_name}, Messages: {len(messages)}")
     
+    if not stream:
+        # Non-streaming response: llama-server returns the whole completion in one JSON body
+        result = run_llama_completion(
+            model_path, prompt, max_tokens, temperature,
+            top_p, top_k, repeat_penalty, seed
+        )
+        return json_response({
+            "model": model_name,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "message": {
+                "role": "assistant",
+                "content": result["content"]
+            },
+            "done": True,
+            "eval_count": result.get("tokens_predicted", 0)
+        })
+    
     def generate():
-        response_id = str(uuid.uuid4())
         created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ")
         
-        if stream:
-            # Stream each chunk
-            for chunk in run_llama_generation(
-                model_path, prompt, max_tokens, temperature, 
-                top_p, top_k, repeat_penalty, seed, stream=True
-            ):
-                response = {
-                    "model": model_name,
-                    "created_at": created_at,
-                    "message": {
-                        "role": "assistant",
-                        "content": chunk
-                    },
-                    "done": False
-                }
-                yield f"data: {json.dumps(response)}\n\n"
-            
-            # Send final chunk
-            final_response = {
-                "model": model_name,
-                "created_at": created_at,
-                "message": {
-                    "role": "assistant",
-                    "content": ""
-                },
-                "done": True,
-                "total_duration": int(time.time() * 1e9),
-                "prompt_eval_count": len(prompt.split()),
-                "eval_count": max_tokens
-            }
-            yield f"data: {json.dumps(final_response)}\n\n"
-        else:
-            # Non-streaming response
-            full_response = ""
-            for chunk in run_llama_generation(
-                model_path, prompt, max_tokens, temperature,
-                top_p, top_k, repeat_penalty, seed, stream=False
-            ):
-                full_response += chunk
-            
-            yield json.dumps({
-                "model": model_name,
-                "created_at": created_at,
-                "message": {
-                    "role": "assistant",
-                    "content": full_response
-                },
-                "done": True
-            })
-    
-    if stream:
-        return Response(
-            stream_with_context(generate()),
-            mimetype='text/event-stream',
-            headers={
-                'Cache-Control': 'no-cache',
-                'X-Accel-Buffering': 'no'
-            }
-        )
-    else:
-        return Response(
-            generate(),
-            mimetype='application/json'
-        )
+        # Stream each chunk, encoding only its content
+        prefix, suffix = sse_envelope(model_name, created_at, "message")
+        for chunk in run_llama_generation(
+            model_path, prompt, max_tokens, temperature, 
+            top_p, top_k, repeat_penalty, seed
+        ):
+            yield prefix + dumps_bytes(chunk) + suffix
+        
+        # Send final chunk
+        final_response = {
+            "model": model_name,
+            "created_at": created_at,
+            "message": {
+                "role": "assistant",
+                "content": ""
+            },
+            "done": True,
+            "total_duration": int(time.time() * 1e9),
+            "prompt_eval_count": len(prompt.split()),
+            "eval_count": max_tokens
+        }
+        yield b"data: " + dumps_bytes(final_response) + b"\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
 
 @app.route('/api/generate', methods=['POST'])
 def generate():
@@ -527,65 +1039,52 @@ def generate():
     # Get model path
     model_path = get_model_path(model_name)
     if not model_path:
-        return jsonify({"error": f"Model {model_name} not found"}), 404
+        return json_response({"error": f"Model {model_name} not found"}), 404
     
     logger.info(f"Generate request - Model: {model_name}, Prompt length: {len(prompt)}")
     
+    if not stream:
+        # Non-streaming response: llama-server returns the whole completion in one JSON body
+        result = run_llama_completion(
+            model_path, prompt, max_tokens, temperature,
+            top_p, top_k, repeat_penalty, seed
+        )
+        return json_response({
+            "model": model_name,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "response": result["content"],
+            "done": True,
+            "eval_count": result.get("tokens_predicted", 0)
+        })
+    
     def generate_response():
         created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ")
         
-        if stream:
-            # Stream each token/chunk
-            for chunk in run_llama_generation(
-                model_path, prompt, max_tokens, temperature,
-                top_p, top_k, repeat_penalty, seed, stream=True
-            ):
-                response = {
-                    "model": model_name,
-                    "created_at": created_at,
-                    "response": chunk,
-                    "done": False
-                }
-                yield f"data: {json.dumps(response)}\n\n"
-            
-            # Send final chunk
-            final_response = {
-                "model": model_name,
-                "created_at": created_at,
-                "response": "",
-                "done": True
-            }
-            yield f"data: {json.dumps(final_response)}\n\n"
-        else:
-            # Non-streaming response
-            full_response = ""
-            for chunk in run_llama_generation(
-                model_path, prompt, max_tokens, temperature,
-                top_p, top_k, repeat_penalty, seed, stream=False
-            ):
-                full_response += chunk
-            
-            yield json.dumps({
-                "model": model_name,
-                "created_at": created_at,
-                "response": full_response,
-                "done": True
-            })
-    
-    if stream:
-        return Response(
-            stream_with_context(generate_response()),
-            mimetype='text/event-stream',
-            headers={
-                'Cache-Control': 'no-cache',
-                'X-Accel-Buffering': 'no'
-            }
-        )
-    else:
-        return Response(
-            generate_response(),
-            mimetype='application/json'
-        )
+        # Stream each token/chunk, encoding only its content
+        prefix, suffix = sse_envelope(model_name, created_at, "response")
+        for chunk in run_llama_generation(
+            model_path, prompt, max_tokens, temperature,
+            top_p, top_k, repeat_penalty, seed
+        ):
+            yield prefix + dumps_bytes(chunk) + suffix
+        
+        # Send final chunk
+        final_response = {
+            "model": model_name,
+            "created_at": created_at,
+            "response": "",
+            "done": True
+        }
+        yield b"data: " + dumps_bytes(final_response) + b"\n\n"
+    
+    return Response(
+        stream_with_context(generate_response()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
 
 @app.route('/api/pull', methods=['POST'])
 def pull_model():
@@ -595,20 +1094,20 @@ def pull_model():
     
     # For embedding models, just return success
     if 'embed' in model_name.lower() or 'minilm' in model_name.lower():
-        return jsonify({
+        return json_response({
             "status": "success",
-            "digest": hashlib.sha256(model_name.encode()).hexdigest()[:12],
+            "digest": model_digest(model_name),
             "note": "Embedding model simulated for compatibility"
         })
     
     model_path = get_model_path(model_name)
     if model_path:
-        return jsonify({
+        return json_response({
             "status": "success",
-            "digest": hashlib.sha256(model_name.encode()).hexdigest()[:12]
+            "digest": model_digest(model_name)
         })
     else:
-        return jsonify({"error": f"Model {model_name} not found. Please download it first."}), 404
+        return json_response({"error": f"Model {model_name} not found. Please download it first."}), 404
 
 @app.route('/api/embeddings', methods=['POST'])
 def generate_embeddings():
@@ -616,64 +1115,88 @@ def generate_embeddings():
     data = request.get_json()
     prompt = data.get('prompt', '')
     
-    # Return dummy embeddings for compatibility
-    import random
-    embedding = [random.random() for _ in range(384)]
-    
-    return jsonify({
-        "embedding": embedding
+    # Return dummy embeddings for compatibility (values are meaningless, so reuse one vector)
+    return json_response({
+        "embedding": _STUB_EMBEDDING
     })
 
 @app.route('/health', methods=['GET'])
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({
+    # Snapshot under the lock; servers start and exit on other request threads
+    with LLAMA_SERVERS_LOCK:
+        gpu_layers_loaded = {Path(path).name: layers for path, layers in LLAMA_SERVER_GPU_LAYERS.items()}
+        models_loaded = len(LLAMA_SERVERS)
+        
+    return json_response({
         "status": "ok",
         "gpu_enabled": True,
-        "gpu_layers": DEFAULT_GPU_LAYERS,
+        # OLLAMA_GPU_LAYERS when set, otherwise picked per model when its server starts
+        "gpu_layers": DEFAULT_GPU_LAYERS if GPU_LAYERS_OVERRIDE is not None else "auto",
+        "gpu_layers_loaded": gpu_layers_loaded,
+        "models_loaded": models_loaded,
         "models_available": len(set(MODEL_REGISTRY.values())) if MODEL_REGISTRY else 0
     })
 
-if __name__ == '__main__':
-    import atexit
-    import signal
+def cleanup():
+    """Stop persistent llama-server processes"""
+    logger.info("Stopping llama-server processes...")
+    stop_llama_servers()
+
+def init_bridge(watch_models: bool = True):
+    """Check the environment, register cleanup and run the initial model scan"""
+    logger.info("="*60)
+    logger.info("Starting Ollama GPU Bridge v2")
+    logger.info("="*60)
     
+    # Check environment
+    logger.info(f"Python version: {sys.version}")
+    logger.info(f"Working directory: {os.getcwd()}")
+    logger.info(f"Models directory: {MODELS_DIR}")
+    logger.info(f"llama-server binary: {LLAMA_SERVER_BIN}")
+    logger.info(f"GPU layers: {DEFAULT_GPU_LAYERS if GPU_LAYERS_OVERRIDE is not None else 'auto per model'}")
+    logger.info(f"Threads: {DEFAULT_THREADS}")
+    
+    # Check if binary is executable
+    if not os.access(LLAMA_SERVER_BIN, os.X_OK):
+        logger.error(f"Binary not executable: {LLAMA_SERVER_BIN}")
+        sys.exit(1)
+    
+    # Register cleanup so llama-server children never outlive the bridge
+    atexit.register(cleanup)
+    
+    # Initial model scan
+    logger.info("Scanning for models...")
+    refresh_models()
+    
+    if not MODEL_REGISTRY:
+        logger.warning("No models found in registry!")
+        logger.warning(f"Check models directory: {MODELS_DIR}")
+    else:
+        logger.info(f"Found {len(set(MODEL_REGISTRY.values()))} unique models")
+        model_names = list(MODEL_REGISTRY.keys())
+        logger.info(f"Sample model names: {model_names[:5]}")
+    
+    # Rescan from a background watcher instead of checking directories on each request
+    if watch_models and start_model_watcher():
+        logger.info("Watching model directories for changes")
+    else:
+        logger.info("Checking model directories for changes on /api/tags polls and lookup misses")
+
+if __name__ == '__main__':
     try:
-        logger.info("="*60)
-        logger.info("Starting Ollama GPU Bridge v2")
-        logger.info("="*60)
-        
-        # Check environment
-        logger.info(f"Python version: {sys.version}")
-        logger.info(f"Working directory: {os.getcwd()}")
-        logger.info(f"Models directory: {MODELS_DIR}")
-        logger.info(f"llama.cpp binary: {LLAMA_BIN}")
-        logger.info(f"GPU layers: {DEFAULT_GPU_LAYERS}")
+        init_bridge()
+        signal.signal(signal.SIGINT, lambda s, f: sys.exit(0))
+        signal.signal(signal.SIGTERM, lambda s, f: sys.exit(0))
         
-        # Check if binary is executable
-        if not os.access(LLAMA_BIN, os.X_OK):
-            logger.error(f"Binary not executable: {LLAMA_BIN}")
-            sys.exit(1)
-        
-        # Initial model scan
-        logger.info("Scanning for models...")
-        scan_models()
-        
-        if not MODEL_REGISTRY:
-            logger.warning("No models found in registry!")
-            logger.warning(f"Check models directory: {MODELS_DIR}")
-        else:
-            logger.info(f"Found {len(set(MODEL_REGISTRY.values()))} unique models")
-            model_names = list(MODEL_REGISTRY.keys())
-            logger.info(f"Sample model names: {model_names[:5]}")
-        
-        logger.info(f"Starting server on http://127.0.0.1:11434")
+        logger.info(f"Starting server on http://127.0.0.1:{BRIDGE_PORT}")
+        logger.info("For many concurrent streams, run scripts/gpu_bridge_wsgi.py under gunicorn instead")
         
         # Run server
-        app.run(host='127.0.0.1', port=11434, debug=False, threaded=True, use_reloader=False)
+        app.run(host='127.0.0.1', port=BRIDGE_PORT, debug=False, threaded=True, use_reloader=False)
         
     except Exception as e:
         logger.error(f"Failed to start GPU bridge: {e}")
         logger.error(traceback.format_exc())
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -1,24 +1,44 @@
 #!/data/data/com.termux/files/usr/bin/python3
 """
 Ollama-compatible API bridge for llama.cpp with GPU acceleration
-Provides the same API endpoints as Ollama but uses llama.cpp directly
+Provides the same API endpoints as Ollama, backed by llama.cpp's llama-server
 """
 
 import os
+import re
 import sys
 import json
 import time
+import socket
+import asyncio
 import subprocess
-import threading
-import queue
 import hashlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import traceback
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional, Dict, List, Generator
-from flask import Flask, request, jsonify, Response, stream_with_context
-from flask_cors import CORS
+from typing import Optional, Dict, List, AsyncGenerator
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 import logging
 
+# orjson is optional; it is much faster than json for request bodies, responses and
+# every streamed token
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# cachetools is optional; without it deterministic responses are simply not cached
+try:
+    from cachetools import TTLCache
+except ImportError:
+    TTLCache = None
+
 # Configure logging to both file and console
 LOG_FILE = Path.home() / "PocketLLM" / "logs" / "gpu-bridge.log"
 LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -33,8 +53,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Stop llama-server processes when uvicorn shuts down"""
+    yield
+    await LLAMA_HTTP.aclose()
+    cleanup()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 # Configuration
 LLAMA_BIN = Path.home() / "llama.cpp" / "build" / "bin" / "main"
@@ -49,15 +76,16 @@ except Exception as e:
     logger.error(f"Failed to create directories: {e}")
     sys.exit(1)
 
-# Check if llama.cpp binary exists
-if not LLAMA_BIN.exists():
-    # Try alternative location (symlink)
-    LLAMA_BIN_ALT = Path.home() / "llama.cpp" / "build" / "bin" / "llama-cli"
-    if LLAMA_BIN_ALT.exists():
-        logger.info(f"Using alternative binary: {LLAMA_BIN_ALT}")
-        LLAMA_BIN = LLAMA_BIN_ALT
+# Check if llama-server binary exists
+LLAMA_SERVER_BIN = LLAMA_BIN.parent / "llama-server"
+if not LLAMA_SERVER_BIN.exists():
+    # Try alternative location (older builds name it "server")
+    LLAMA_SERVER_BIN_ALT = LLAMA_BIN.parent / "server"
+    if LLAMA_SERVER_BIN_ALT.exists():
+        logger.info(f"Using alternative binary: {LLAMA_SERVER_BIN_ALT}")
+        LLAMA_SERVER_BIN = LLAMA_SERVER_BIN_ALT
     else:
-        logger.error(f"llama.cpp binary not found at {LLAMA_BIN} or {LLAMA_BIN_ALT}")
+        logger.error(f"llama-server binary not found at {LLAMA_SERVER_BIN} or {LLAMA_SERVER_BIN_ALT}")
         logger.error("Please run: bash scripts/termux-gpu-setup.sh")
         sys.exit(1)
 
@@ -65,248 +93,532 @@ if not LLAMA_BIN.exists():
 DEFAULT_GPU_LAYERS = 16
 DEFAULT_THREADS = os.cpu_count() or 4
 DEFAULT_CONTEXT = 4096
+DEFAULT_MAX_TOKENS = 512
+
+# llama-server settings (each server runs LLAMA_SERVER_SLOTS parallel decode slots)
+LLAMA_SERVER_HOST = "127.0.0.1"
+LLAMA_SERVER_SLOTS = int(os.getenv('OLLAMA_NUM_PARALLEL', 4))
+LLAMA_SERVER_STARTUP_TIMEOUT = 120
+
+# Embedding model to serve /api/embeddings with (defaults to the requested model when it
+# is a local GGUF); without one the endpoint answers 503 so callers use their own fallback
+EMBED_MODEL = os.getenv('OLLAMA_EMBED_MODEL')
+# Embedding servers run beside a chat server for the same file, so keep them small: one
+# slot, a short context, and no GPU layers (the CPU weights are mmapped, so the two
+# servers share them through the page cache instead of holding two copies)
+EMBED_CONTEXT = 2048
+EMBED_GPU_LAYERS = 0
 
 # Model registry (maps Ollama model names to GGUF files)
 MODEL_REGISTRY = {}
+
+# Lookup indexes built by scan_models(): every alias normalized to lowercase letters and
+# digits, and every prefix of those normalized aliases (first model registered wins)
+NORMALIZED_REGISTRY = {}
+PREFIX_INDEX = {}
+# Distinct normalized alias lengths, longest first, so prefix probes skip lengths no alias has
+NORMALIZED_LENGTHS = []
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]')
+
+# Per-file metadata for /api/tags computed by scan_models() (maps model path to preferred
+# name, size, preformatted mtime, digest, family and size label)
+MODEL_META = {}
+
+# (path, size, mtime) of every model at the last scan, and the /api/tags body built from it
+_last_scan_state = None
+_cached_models_json = None
+
+# Fake embedding model entry listed by /api/tags so the backend thinks it's available
+# (this prevents the backend from trying to pull it at startup)
+_EMBED_STUB_ENTRY = {
+    "name": "nomic-embed-text:latest",
+    "model": "nomic-embed-text:latest",
+    "modified_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    "size": 274302450,  # Fake size
+    "digest": "0a109f422b47",
+    "details": {
+        "format": "gguf",
+        "family": "nomic",
+        "parameter_size": "137M",
+        "quantization_level": "F16"
+    }
+}
+
+# Threads used to stat model files in parallel (hides per-call latency on FUSE-backed storage)
+SCAN_STAT_WORKERS = 8
+_STAT_POOL = ThreadPoolExecutor(max_workers=SCAN_STAT_WORKERS)
+
+# Bumped whenever scan_models() rebuilds the registry, so memoized lookups go stale
+_REGISTRY_VERSION = 0
+
+# Last formatted created_at timestamp and the second it was formatted for
+_TS_CACHE = [0, ""]
+
+# Responses to temperature 0 non-streaming requests, keyed by a hash of model, prompt
+# and temperature (UIs repeat identical probe prompts)
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL = 3600
+_RESP_CACHE = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL) if TTLCache else None
+
+# Running llama-server sessions (maps model path to session, so aliases share one server);
+# embedding servers run with --embedding and are kept separately
 ACTIVE_SESSIONS = {}
+EMBED_SESSIONS = {}
+# One lock per (embedding, model path), held only while that server starts; requests
+# for other models, or for servers already running, never wait on it
+STARTUP_LOCKS = {}
+
+# When each (embedding, model path) last failed to start; retries wait this many seconds
+STARTUP_FAILURES = {}
+LLAMA_SERVER_RETRY_DELAY = 30
+
+# Shared async HTTP client; completions stream from llama-server on the event loop
+LLAMA_HTTP = httpx.AsyncClient(timeout=None)
 
 class LlamaCppSession:
-    """Manages a llama.cpp process for a specific model"""
+    """Manages a llama-server process for a specific model"""
     
-    def __init__(self, model_path: str, gpu_layers: int = DEFAULT_GPU_LAYERS):
+    def __init__(self, model_path: str, gpu_layers: int = DEFAULT_GPU_LAYERS, embedding: bool = False):
         self.model_path = model_path
         self.gpu_layers = gpu_layers
+        self.embedding = embedding
         self.process = None
-        self.input_queue = queue.Queue()
-        self.output_queue = queue.Queue()
-        self.context = []
-        
-    def start(self):
-        """Start the llama.cpp process"""
+        self.port = None
+        self.num_slots = 1 if embedding else LLAMA_SERVER_SLOTS
+        self.context = EMBED_CONTEXT if embedding else DEFAULT_CONTEXT * self.num_slots
+        # One permit per server slot: extra requests wait here instead of piling up
+        # in llama-server's queue, and wake only when a slot is released
+        self.slots = asyncio.Semaphore(self.num_slots)
+        
+    async def start(self):
+        """Start llama-server and wait until the model is loaded"""
         if self.process:
             return
             
+        self.port = find_free_port()
         cmd = [
-            str(LLAMA_BIN),
+            str(LLAMA_SERVER_BIN),
             "-m", self.model_path,
             "-ngl", str(self.gpu_layers),
             "-t", str(DEFAULT_THREADS),
-            "-c", str(DEFAULT_CONTEXT),
-            "--interactive",
-            "--interactive-first",
-            "--simple-io",
-            "-n", "512",
-            "--temp", "0.7",
-            "--top-p", "0.9",
-            "--top-k", "40",
-            "--repeat-penalty", "1.1",
+            # Context is shared between slots, so size it per slot
+            "-c", str(self.context),
+            # Parallel slots with continuous batching: concurrent requests decode together
+            "-np", str(self.num_slots),
+            "--cont-batching",
+            "--host", LLAMA_SERVER_HOST,
+            "--port", str(self.port)
         ]
+        if self.embedding:
+            # Chat models default to no pooling, which returns one vector per token;
+            # mean pooling gives one vector for the whole prompt
+            cmd.extend(["--embedding", "--pooling", "mean"])
+        
+        logger.info(f"Starting llama-server with: {' '.join(cmd)}")
+        
+        # Send server output to its own log file so an unread pipe can never fill up
+        log_suffix = "-embedding" if self.embedding else ""
+        server_log = LOG_FILE.parent / f"llama-server-{Path(self.model_path).stem}{log_suffix}.log"
+        with open(server_log, "ab") as log:
+            self.process = subprocess.Popen(
+                cmd,
+                stdout=log,
+                stderr=subprocess.STDOUT
+            )
         
-        logger.info(f"Starting llama.cpp with: {' '.join(cmd)}")
-        
-        self.process = subprocess.Popen(
-            cmd,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-        
-        # Start output reader thread
-        self.reader_thread = threading.Thread(target=self._read_output)
-        self.reader_thread.daemon = True
-        self.reader_thread.start()
-        
-    def _read_output(self):
-        """Read output from llama.cpp process"""
-        while self.process and self.process.poll() is None:
+        try:
+            await self._wait_until_ready()
+        except Exception:
+            self.stop()
+            raise
+        
+    async def _wait_until_ready(self):
+        """Poll /health until llama-server has loaded the model"""
+        url = f"http://{LLAMA_SERVER_HOST}:{self.port}/health"
+        deadline = time.time() + LLAMA_SERVER_STARTUP_TIMEOUT
+        # Start polling fast so small models are picked up within ~20ms of loading,
+        # backing off to 0.5s for slow loads
+        delay = 0.02
+        
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"llama-server exited with code {self.process.returncode}")
             try:
-                line = self.process.stdout.readline()
-                if line:
-                    self.output_queue.put(line.rstrip())
-            except Exception as e:
-                logger.error(f"Error reading output: {e}")
-                break
+                # llama-server answers 503 while the model is still loading
+                resp = await LLAMA_HTTP.get(url, timeout=1)
+                if resp.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            
+        raise RuntimeError(f"llama-server did not become ready within {LLAMA_SERVER_STARTUP_TIMEOUT}s")
                 
-    def generate(self, prompt: str, stream: bool = True) -> Generator[str, None, None]:
+    async def generate(self, prompt: str, stream: bool = True, temperature: float = 0.7) -> AsyncGenerator[str, None]:
         """Generate response from prompt"""
+        # start() returns once /health reports the model loaded, so no warmup sleep
         if not self.process:
-            self.start()
-            time.sleep(1)  # Give process time to initialize
+            await self.start()
             
-        # Clear any pending output
-        while not self.output_queue.empty():
-            self.output_queue.get_nowait()
-            
-        # Send prompt
-        self.process.stdin.write(prompt + "\n")
-        self.process.stdin.flush()
-        
-        # Collect response
-        response_lines = []
-        empty_line_count = 0
-        start_time = time.time()
-        
-        while True:
-            try:
-                line = self.output_queue.get(timeout=0.1)
+        payload = {
+            "prompt": prompt,
+            "stream": stream,
+            "n_predict": DEFAULT_MAX_TOKENS,
+            "temperature": temperature,
+            "top_p": 0.9,
+            "top_k": 40,
+            "repeat_penalty": 1.1,
+            # Let the server pick a free slot and reuse its KV cache for a matching prefix
+            "cache_prompt": True,
+            "id_slot": -1
+        }
+        url = f"http://{LLAMA_SERVER_HOST}:{self.port}/completion"
+        
+        async with self.slots:
+            # If not streaming, the server returns the whole completion at once
+            if not stream:
+                resp = await LLAMA_HTTP.post(url, json=payload)
+                resp.raise_for_status()
+                yield loads_json(resp.content)["content"]
+                return
                 
-                # Skip echo of prompt
-                if line.strip() == prompt.strip():
-                    continue
-                    
-                # Check for completion patterns
-                if not line:
-                    empty_line_count += 1
-                    if empty_line_count > 2:
-                        break
-                else:
-                    empty_line_count = 0
-                    response_lines.append(line)
-                    
-                    if stream:
-                        yield line + "\n"
-                        
-                # Timeout after 30 seconds
-                if time.time() - start_time > 30:
-                    break
-                    
-            except queue.Empty:
-                # Check if we've received any response
-                if response_lines and time.time() - start_time > 2:
-                    break
-                continue
+            async with LLAMA_HTTP.stream("POST", url, json=payload) as resp:
+                resp.raise_for_status()
+                
+                # Server-sent events, one token per frame, until the server reports stop.
+                # Split frames out of whatever bytes have arrived rather than waiting to fill
+                # a fixed-size read, so every token is passed on the moment it lands. Lines
+                # stay bytes; loads_json decodes the UTF-8 of each complete frame.
+                pending = b""
+                async for data in resp.aiter_bytes():
+                    *lines, pending = (pending + data).split(b"\n")
+                    for line in lines:
+                        if not line.startswith(b"data: "):
+                            continue
+                        chunk = loads_json(line[6:])
+                        if chunk.get("content"):
+                            yield chunk["content"]
+                        if chunk.get("stop"):
+                            return
                 
-        if not stream:
-            yield "\n".join(response_lines)
+    async def embed(self, prompt: str) -> List[float]:
+        """Get the embedding vector for a prompt from an --embedding server"""
+        url = f"http://{LLAMA_SERVER_HOST}:{self.port}/embedding"
+        resp = await LLAMA_HTTP.post(url, json={"content": prompt})
+        resp.raise_for_status()
+        
+        # Older servers return {"embedding": [...]}, newer ones a list of results
+        # whose embedding is nested one level deeper
+        result = resp.json()
+        if isinstance(result, list):
+            result = result[0]
+        embedding = result["embedding"]
+        if embedding and isinstance(embedding[0], list):
+            # One row when pooled; per-token rows if the server ignored --pooling,
+            # so mean-pool them rather than returning the first token's vector
+            if len(embedding) == 1:
+                embedding = embedding[0]
+            else:
+                embedding = [sum(column) / len(embedding) for column in zip(*embedding)]
+        return embedding
             
     def stop(self):
-        """Stop the llama.cpp process"""
+        """Stop the llama-server process"""
         if self.process:
             self.process.terminate()
             self.process.wait()
             self.process = None
 
+def find_free_port() -> int:
+    """Ask the OS for an unused localhost port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((LLAMA_SERVER_HOST, 0))
+        return sock.getsockname()[1]
+
+def now_iso() -> str:
+    """Current UTC time as an Ollama timestamp, formatted at most once per second"""
+    now = int(time.time())
+    if now != _TS_CACHE[0]:
+        _TS_CACHE[:] = [now, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))]
+    return _TS_CACHE[1]
+
+def dumps_bytes(obj) -> bytes:
+    """Serialize obj to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+def loads_json(data):
+    """Parse JSON from str or bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_response(obj, status_code: int = 200) -> Response:
+    """Return obj as an application/json response (used in place of JSONResponse)"""
+    return Response(dumps_bytes(obj), status_code=status_code, media_type='application/json')
+
+class BadRequestBody(Exception):
+    """Raised by read_json() for a body that is not a JSON object"""
+
+@app.exception_handler(BadRequestBody)
+async def bad_request_body(request: Request, exc: BadRequestBody):
+    """Answer malformed bodies with a 400, as Flask's get_json() did"""
+    return json_response({"error": str(exc)}, status_code=400)
+
+async def read_json(request: Request):
+    """Parse the request body as a JSON object"""
+    try:
+        data = loads_json(await request.body())
+    except ValueError as e:
+        # orjson.JSONDecodeError and json.JSONDecodeError both subclass ValueError
+        raise BadRequestBody(f"Invalid JSON body: {e}")
+    if not isinstance(data, dict):
+        raise BadRequestBody("Request body must be a JSON object")
+    return data
+
+def response_cache_key(model_path: str, prompt: str, temperature: float) -> Optional[bytes]:
+    """Key for a cacheable (deterministic, temperature 0) response, or None"""
+    if _RESP_CACHE is None or temperature != 0:
+        return None
+    return hashlib.sha256(dumps_bytes([model_path, prompt, temperature])).digest()
+
+def sse_frame(obj) -> bytes:
+    """Encode obj as a server-sent event frame"""
+    return b"data: " + dumps_bytes(obj) + b"\n\n"
+
+def normalize_name(name: str) -> str:
+    """Reduce a model name to lowercase letters and digits for lookups"""
+    return _NON_ALNUM_RE.sub('', name.lower())
+
+def classify_model(filename_lower: str) -> tuple:
+    """Determine model family and parameter size from a lowercase filename"""
+    family = "llama"  # default
+    param_size = "1B"  # default
+    
+    if "tinyllama" in filename_lower:
+        family = "tinyllama"
+        param_size = "1.1B"
+    elif "llama" in filename_lower:
+        family = "llama"
+        if "1b" in filename_lower:
+            param_size = "1B"
+        elif "3b" in filename_lower:
+            param_size = "3B"
+        elif "7b" in filename_lower or "8b" in filename_lower:
+            param_size = "8B"
+    elif "phi" in filename_lower:
+        family = "phi"
+        param_size = "3.8B"
+    elif "gemma" in filename_lower:
+        family = "gemma"
+        param_size = "2B"
+    elif "qwen" in filename_lower:
+        family = "qwen"
+        param_size = "1.8B"
+        
+    return family, param_size
+
+def stat_model_file(model_file: Path) -> tuple:
+    """Stat a model file, returning (path, stat result or the OSError raised)"""
+    try:
+        return model_file, model_file.stat()
+    except OSError as e:
+        return model_file, e
+
 def scan_models():
     """Scan for available GGUF models"""
-    global MODEL_REGISTRY
-    MODEL_REGISTRY = {}
+    global MODEL_REGISTRY, MODEL_META, NORMALIZED_REGISTRY, PREFIX_INDEX, NORMALIZED_LENGTHS, _last_scan_state, _cached_models_json, _REGISTRY_VERSION
     
+    # An empty directory still goes through the full scan below, so every index is reset
     if not MODELS_DIR.exists():
         MODELS_DIR.mkdir(parents=True, exist_ok=True)
+        
+    # Stat every file up front in parallel; map() keeps glob order for registration
+    stat_results = list(_STAT_POOL.map(stat_model_file, MODELS_DIR.glob("*.gguf")))
+    
+    # Skip the rescan while no model was added, removed, renamed or rewritten; a download
+    # writing into MODELS_DIR changes the file's size and mtime but not the directory's
+    scan_state = tuple(
+        (str(model_file), st.st_size, st.st_mtime_ns)
+        for model_file, st in stat_results if not isinstance(st, OSError)
+    )
+    if scan_state == _last_scan_state:
         return
         
-    for model_file in MODELS_DIR.glob("*.gguf"):
+    registry = {}
+    file_stats = {}
+    
+    for model_file, st in stat_results:
+        if isinstance(st, OSError):
+            logger.warning(f"Skipping unreadable model {model_file}: {st}")
+            continue
         path_str = str(model_file)
+        file_stats[path_str] = st
         filename = model_file.name
         stem = model_file.stem
         stem_lower = stem.lower()
         
         # Register with multiple name variations
         # 1. Full filename
-        MODEL_REGISTRY[filename] = path_str
+        registry[filename] = path_str
         
         # 2. Stem (without .gguf)
-        MODEL_REGISTRY[stem] = path_str
-        MODEL_REGISTRY[stem_lower] = path_str
+        registry[stem] = path_str
+        registry[stem_lower] = path_str
         
         # 3. Simplified names (replace dashes and dots)
         simple_name = stem_lower.replace("-", "_").replace(".", "_")
-        MODEL_REGISTRY[simple_name] = path_str
+        registry[simple_name] = path_str
         
         # 4. Create Ollama-style names based on model type
         # Check the original filename, not the modified name
         if "tinyllama" in stem_lower:
-            MODEL_REGISTRY["tinyllama"] = path_str
-            MODEL_REGISTRY["tinyllama:latest"] = path_str
-            MODEL_REGISTRY["tinyllama:1b"] = path_str
-            MODEL_REGISTRY["tinyllama:1.1b"] = path_str
+            registry["tinyllama"] = path_str
+            registry["tinyllama:latest"] = path_str
+            registry["tinyllama:1b"] = path_str
+            registry["tinyllama:1.1b"] = path_str
             
         if "llama" in stem_lower and "3.2" in stem_lower:
-            MODEL_REGISTRY["llama3.2:1b"] = path_str
-            MODEL_REGISTRY["llama3.2"] = path_str
-            MODEL_REGISTRY["llama3:latest"] = path_str
-            MODEL_REGISTRY["llama3"] = path_str
+            registry["llama3.2:1b"] = path_str
+            registry["llama3.2"] = path_str
+            registry["llama3:latest"] = path_str
+            registry["llama3"] = path_str
             
         if "llama3" in stem_lower:
-            MODEL_REGISTRY["llama3"] = path_str
-            MODEL_REGISTRY["llama3:latest"] = path_str
+            registry["llama3"] = path_str
+            registry["llama3:latest"] = path_str
             if "1b" in stem_lower:
-                MODEL_REGISTRY["llama3:1b"] = path_str
-                MODEL_REGISTRY["llama3.2:1b"] = path_str
+                registry["llama3:1b"] = path_str
+                registry["llama3.2:1b"] = path_str
             elif "3b" in stem_lower:
-                MODEL_REGISTRY["llama3:3b"] = path_str
+                registry["llama3:3b"] = path_str
             elif "7b" in stem_lower or "8b" in stem_lower:
-                MODEL_REGISTRY["llama3:8b"] = path_str
+                registry["llama3:8b"] = path_str
                 
         if "phi" in stem_lower:
-            MODEL_REGISTRY["phi3:mini"] = path_str
-            MODEL_REGISTRY["phi3:latest"] = path_str
-            MODEL_REGISTRY["phi3"] = path_str
-            MODEL_REGISTRY["phi"] = path_str
+            registry["phi3:mini"] = path_str
+            registry["phi3:latest"] = path_str
+            registry["phi3"] = path_str
+            registry["phi"] = path_str
             
         if "gemma" in stem_lower:
-            MODEL_REGISTRY["gemma:2b"] = path_str
-            MODEL_REGISTRY["gemma:latest"] = path_str
-            MODEL_REGISTRY["gemma"] = path_str
+            registry["gemma:2b"] = path_str
+            registry["gemma:latest"] = path_str
+            registry["gemma"] = path_str
             
         if "qwen" in stem_lower:
-            MODEL_REGISTRY["qwen:1.8b"] = path_str
-            MODEL_REGISTRY["qwen:latest"] = path_str
-            MODEL_REGISTRY["qwen:1.5b"] = path_str
-            MODEL_REGISTRY["qwen"] = path_str
+            registry["qwen:1.8b"] = path_str
+            registry["qwen:latest"] = path_str
+            registry["qwen:1.5b"] = path_str
+            registry["qwen"] = path_str
+        
+    # Metadata for each unique file, keyed by the first name registered for it
+    meta = {}
+    for name, path in registry.items():
+        if path in meta:
+            continue
+        st = file_stats[path]
+        family, param_size = classify_model(Path(path).name.lower())
+        meta[path] = {
+            "name": name,
+            "size": st.st_size,
+            "modified_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(st.st_mtime)),
+            "digest": hashlib.sha256(name.encode()).hexdigest()[:12],
+            "family": family,
+            "param_size": param_size
+        }
+    
+    # Build the /api/tags body once per scan so list_models() only serves bytes
+    models = []
+    for m in meta.values():
+        models.append({
+            "name": m["name"],
+            "model": m["name"],
+            "modified_at": m["modified_at"],
+            "size": m["size"],
+            "digest": m["digest"],
+            "details": {
+                "format": "gguf",
+                "family": m["family"],
+                "parameter_size": m["param_size"],
+                "quantization_level": "Q4_K_M"
+            }
+        })
+    models.append(_EMBED_STUB_ENTRY)
+    models_json = dumps_bytes({"models": models})
+    
+    # Normalize every alias once so lookups are hash probes instead of string scans
+    normalized = {}
+    prefixes = {}
+    for name, path in registry.items():
+        key = normalize_name(name)
+        normalized.setdefault(key, path)
+        for i in range(1, len(key) + 1):
+            prefixes.setdefault(key[:i], path)
+    lengths = sorted({len(key) for key in normalized}, reverse=True)
+    
+    # Swap in the finished registry and indexes together, so lookups running on the
+    # event loop never see an empty or half-built registry while list_models() scans
+    MODEL_REGISTRY, MODEL_META = registry, meta
+    NORMALIZED_REGISTRY, PREFIX_INDEX, NORMALIZED_LENGTHS = normalized, prefixes, lengths
+    _cached_models_json = models_json
+    _last_scan_state = scan_state
+    _REGISTRY_VERSION += 1
         
     logger.info(f"Found {len(set(MODEL_REGISTRY.values()))} unique models with {len(MODEL_REGISTRY)} name mappings")
     for name, path in MODEL_REGISTRY.items():
         logger.debug(f"  {name} -> {Path(path).name}")
 
-def get_model_path(model_name: str) -> Optional[str]:
-    """Get the actual model path from a model name"""
-    # Refresh registry if empty
-    if not MODEL_REGISTRY:
-        scan_models()
-        
+@functools.lru_cache(maxsize=512)
+def _resolve(model_name: str, version: int) -> Optional[str]:
+    """Resolve a model name against the registry (memoized per registry version)"""
     # Try direct lookup
     if model_name in MODEL_REGISTRY:
         return MODEL_REGISTRY[model_name]
         
-    # Try lowercase
-    model_lower = model_name.lower()
-    if model_lower in MODEL_REGISTRY:
-        return MODEL_REGISTRY[model_lower]
-        
-    # Try with various transformations
-    # Replace spaces with dashes or underscores
-    variations = [
-        model_name.replace(" ", "-"),
-        model_name.replace(" ", "_"),
-        model_name.replace("-", "_"),
-        model_name.replace("_", "-"),
-    ]
-    
-    for variant in variations:
-        if variant in MODEL_REGISTRY:
-            return MODEL_REGISTRY[variant]
-        if variant.lower() in MODEL_REGISTRY:
-            return MODEL_REGISTRY[variant.lower()]
+    # Try the normalized name (covers case, spaces, dashes, underscores and dots)
+    key = normalize_name(model_name)
+    if key in NORMALIZED_REGISTRY:
+        return NORMALIZED_REGISTRY[key]
     
     # Try without tag
     if ":" in model_name:
-        base_name = model_name.split(":")[0]
-        if base_name in MODEL_REGISTRY:
-            return MODEL_REGISTRY[base_name]
-        if f"{base_name}:latest" in MODEL_REGISTRY:
-            return MODEL_REGISTRY[f"{base_name}:latest"]
+        base_key = normalize_name(model_name.split(":")[0])
+        for candidate in (base_key, base_key + "latest"):
+            if candidate in NORMALIZED_REGISTRY:
+                return NORMALIZED_REGISTRY[candidate]
             
     # Try partial matches for common patterns
     # This helps when UI sends variations of model names
-    for key, path in MODEL_REGISTRY.items():
-        # Check if the model_name is a substring of a registered key
-        if model_name.lower() in key.lower() or key.lower() in model_name.lower():
-            logger.info(f"Partial match: {model_name} -> {key} -> {path}")
+    if key:
+        # The requested name starts a registered name...
+        path = PREFIX_INDEX.get(key)
+        if not path:
+            # ...or the longest registered name that starts the requested name
+            for length in NORMALIZED_LENGTHS:
+                if length < len(key):
+                    path = NORMALIZED_REGISTRY.get(key[:length])
+                    if path:
+                        break
+        if path:
+            logger.info(f"Partial match: {model_name} -> {path}")
             return path
             
+    return None
+
+def get_model_path(model_name: str) -> Optional[str]:
+    """Get the actual model path from a model name"""
+    # Refresh registry if empty
+    if not MODEL_REGISTRY:
+        scan_models()
+        
+    # UIs send the same few names on every request, so registry hits are cached
+    path = _resolve(model_name, _REGISTRY_VERSION)
+    if path:
+        return path
+        
     # If still not found, check if it's a direct file path
     model_path = MODELS_DIR / model_name
     if model_path.exists() and model_path.suffix == ".gguf":
@@ -321,117 +633,67 @@ def get_model_path(model_name: str) -> Optional[str]:
     logger.debug(f"Available models: {list(MODEL_REGISTRY.keys())}")
     return None
 
-def get_or_create_session(model_name: str) -> Optional[LlamaCppSession]:
-    """Get or create a session for a model"""
+async def get_or_create_session(model_name: str, embedding: bool = False) -> Optional[LlamaCppSession]:
+    """Make sure a llama-server is running for a model and return its session"""
     model_path = get_model_path(model_name)
     if not model_path:
         return None
         
-    if model_name not in ACTIVE_SESSIONS:
-        session = LlamaCppSession(model_path)
-        session.start()
-        ACTIVE_SESSIONS[model_name] = session
-        
-    return ACTIVE_SESSIONS[model_name]
+    # Requests never own a session; each one is an independent POST to a server slot
+    sessions = EMBED_SESSIONS if embedding else ACTIVE_SESSIONS
+    session = sessions.get(model_path)
+    if session and session.process and session.process.poll() is None:
+        return session
+        
+    # Only requests for this model wait while its server loads
+    lock = STARTUP_LOCKS.setdefault((embedding, model_path), asyncio.Lock())
+    async with lock:
+        session = sessions.get(model_path)
+        if session and session.process and session.process.poll() is not None:
+            logger.warning(f"llama-server for {Path(model_path).name} exited, restarting")
+            session.stop()
+            session = None
+        if not session:
+            # Don't relaunch a server that just failed on every request
+            failed_at = STARTUP_FAILURES.get((embedding, model_path))
+            if failed_at and time.monotonic() - failed_at < LLAMA_SERVER_RETRY_DELAY:
+                raise RuntimeError(f"llama-server for {Path(model_path).name} failed to start recently")
+            if embedding:
+                session = LlamaCppSession(model_path, gpu_layers=EMBED_GPU_LAYERS, embedding=True)
+            else:
+                session = LlamaCppSession(model_path)
+            try:
+                await session.start()
+            except Exception:
+                STARTUP_FAILURES[(embedding, model_path)] = time.monotonic()
+                raise
+            STARTUP_FAILURES.pop((embedding, model_path), None)
+            sessions[model_path] = session
+        
+    return session
 
 # API Routes
 
-@app.route('/api/tags', methods=['GET'])
-@app.route('/api/models', methods=['GET'])
+@app.get('/api/tags')
+@app.get('/api/models')
 def list_models():
     """List available models (Ollama compatible)"""
     scan_models()
-    
-    models = []
-    seen_files = {}  # Map file paths to their preferred names
-    
-    # First pass: collect all unique files and determine their best names
-    for name, path in MODEL_REGISTRY.items():
-        if path not in seen_files:
-            # Prefer Ollama-style names (with :tag) over plain names
-            if ":" in name:
-                seen_files[path] = name
-            elif path not in seen_files:
-                seen_files[path] = name
-    
-    # Second pass: create model entries for each unique file
-    for path, preferred_name in seen_files.items():
-        model_file = Path(path)
-        if model_file.exists():
-            size = model_file.stat().st_size
-            modified = model_file.stat().st_mtime
-            
-            # Determine model family and size from filename
-            filename_lower = model_file.name.lower()
-            family = "llama"  # default
-            param_size = "1B"  # default
-            
-            if "tinyllama" in filename_lower:
-                family = "tinyllama"
-                param_size = "1.1B"
-            elif "llama" in filename_lower:
-                family = "llama"
-                if "1b" in filename_lower:
-                    param_size = "1B"
-                elif "3b" in filename_lower:
-                    param_size = "3B"
-                elif "7b" in filename_lower or "8b" in filename_lower:
-                    param_size = "8B"
-            elif "phi" in filename_lower:
-                family = "phi"
-                param_size = "3.8B"
-            elif "gemma" in filename_lower:
-                family = "gemma"
-                param_size = "2B"
-            elif "qwen" in filename_lower:
-                family = "qwen"
-                param_size = "1.8B"
-            
-            models.append({
-                "name": preferred_name,
-                "model": preferred_name,
-                "modified_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(modified)),
-                "size": size,
-                "digest": hashlib.sha256(preferred_name.encode()).hexdigest()[:12],
-                "details": {
-                    "format": "gguf",
-                    "family": family,
-                    "parameter_size": param_size,
-                    "quantization_level": "Q4_K_M"
-                }
-            })
-    
-    # Add fake embedding model entries so the backend thinks they're available
-    # This prevents the backend from trying to pull them at startup
-    models.append({
-        "name": "nomic-embed-text:latest",
-        "model": "nomic-embed-text:latest",
-        "modified_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "size": 274302450,  # Fake size
-        "digest": "0a109f422b47",
-        "details": {
-            "format": "gguf",
-            "family": "nomic",
-            "parameter_size": "137M",
-            "quantization_level": "F16"
-        }
-    })
-                
-    return jsonify({"models": models})
+    return Response(_cached_models_json, media_type='application/json')
 
-@app.route('/api/show', methods=['POST'])
-def show_model():
+@app.post('/api/show')
+async def show_model(request: Request):
     """Show model details (Ollama compatible)"""
-    data = request.get_json()
+    data = await read_json(request)
     model_name = data.get('name', '')
     
     model_path = get_model_path(model_name)
     if not model_path:
-        return jsonify({"error": f"Model {model_name} not found"}), 404
+        return json_response({"error": f"Model {model_name} not found"}, status_code=404)
         
     model_file = Path(model_path)
     
-    return jsonify({
+    return json_response({
         "license": "Apache 2.0",
         "modelfile": f"FROM {model_file.name}",
         "parameters": f"gpu_layers {DEFAULT_GPU_LAYERS}\nthreads {DEFAULT_THREADS}",
@@ -444,21 +706,27 @@ def show_model():
         }
     })
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
+@app.post('/api/chat')
+async def chat(request: Request):
     """Chat endpoint (Ollama compatible)"""
-    data = request.get_json()
+    data = await read_json(request)
     model_name = data.get('model', '')
     messages = data.get('messages', [])
     stream = data.get('stream', True)
+    options = data.get('options') or {}
+    temperature = options.get('temperature', 0.7)
     
     if not messages:
-        return jsonify({"error": "No messages provided"}), 400
+        return json_response({"error": "No messages provided"}, status_code=400)
         
-    # Get or create session
-    session = get_or_create_session(model_name)
+    # Get or create session (waits on the event loop while llama-server loads the model)
+    try:
+        session = await get_or_create_session(model_name)
+    except Exception as e:
+        logger.error(f"Failed to start llama-server for {model_name}: {e}")
+        return json_response({"error": str(e)}, status_code=503)
     if not session:
-        return jsonify({"error": f"Model {model_name} not found"}), 404
+        return json_response({"error": f"Model {model_name} not found"}, status_code=404)
         
     # Build prompt from messages
     prompt = ""
@@ -473,25 +741,29 @@ def chat():
         elif role == 'assistant':
             prompt += f"{content}\n"
             
-    def generate():
+    async def generate():
         """Generate streaming response"""
+        # One frame dict per stream; only the timestamp and content change per token
+        response = {
+            "model": model_name,
+            "created_at": "",
+            "message": {
+                "role": "assistant",
+                "content": ""
+            },
+            "done": False
+        }
+        message = response["message"]
         try:
-            for chunk in session.generate(prompt, stream=True):
-                response = {
-                    "model": model_name,
-                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                    "message": {
-                        "role": "assistant",
-                        "content": chunk
-                    },
-                    "done": False
-                }
-                yield f"data: {json.dumps(response)}\n\n"
+            async for chunk in session.generate(prompt, stream=True, temperature=temperature):
+                response["created_at"] = now_iso()
+                message["content"] = chunk
+                yield sse_frame(response)
                 
             # Send done message
             response = {
                 "model": model_name,
-                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "created_at": now_iso(),
                 "done": True,
                 "total_duration": 1000000000,
                 "load_duration": 100000000,
@@ -499,113 +771,140 @@ def chat():
                 "eval_count": 100,
                 "eval_duration": 900000000
             }
-            yield f"data: {json.dumps(response)}\n\n"
+            yield sse_frame(response)
             
         except Exception as e:
             logger.error(f"Error during generation: {e}")
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield sse_frame({'error': str(e)})
             
     if stream:
-        return Response(
-            stream_with_context(generate()),
-            mimetype='text/event-stream',
+        return StreamingResponse(
+            generate(),
+            media_type='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
                 'X-Accel-Buffering': 'no'
             }
         )
     else:
-        # Non-streaming response
-        full_response = ""
-        for chunk in session.generate(prompt, stream=False):
-            full_response += chunk
+        # Non-streaming response (deterministic ones are served from the cache)
+        cache_key = response_cache_key(session.model_path, prompt, temperature)
+        full_response = _RESP_CACHE.get(cache_key) if cache_key else None
+        cached = full_response is not None
+        if not cached:
+            full_response = ""
+            async for chunk in session.generate(prompt, stream=False, temperature=temperature):
+                full_response += chunk
+            if cache_key:
+                _RESP_CACHE[cache_key] = full_response
             
-        return jsonify({
+        response = {
             "model": model_name,
-            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "created_at": now_iso(),
             "message": {
                 "role": "assistant",
                 "content": full_response
             },
             "done": True
-        })
+        }
+        if cached:
+            response["cached"] = True
+        return json_response(response)
 
-@app.route('/api/generate', methods=['POST'])
-def generate_completion():
+@app.post('/api/generate')
+async def generate_completion(request: Request):
     """Generate endpoint (Ollama compatible)"""
-    data = request.get_json()
+    data = await read_json(request)
     model_name = data.get('model', '')
     prompt = data.get('prompt', '')
     stream = data.get('stream', True)
+    options = data.get('options') or {}
+    temperature = options.get('temperature', 0.7)
     
     if not prompt:
-        return jsonify({"error": "No prompt provided"}), 400
+        return json_response({"error": "No prompt provided"}, status_code=400)
         
-    # Get or create session
-    session = get_or_create_session(model_name)
+    # Get or create session (waits on the event loop while llama-server loads the model)
+    try:
+        session = await get_or_create_session(model_name)
+    except Exception as e:
+        logger.error(f"Failed to start llama-server for {model_name}: {e}")
+        return json_response({"error": str(e)}, status_code=503)
     if not session:
-        return jsonify({"error": f"Model {model_name} not found"}), 404
+        return json_response({"error": f"Model {model_name} not found"}, status_code=404)
         
-    def generate():
+    async def generate():
         """Generate streaming response"""
+        # One frame dict per stream; only the timestamp and response change per token
+        response = {
+            "model": model_name,
+            "created_at": "",
+            "response": "",
+            "done": False
+        }
         try:
-            for chunk in session.generate(prompt, stream=True):
-                response = {
-                    "model": model_name,
-                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                    "response": chunk,
-                    "done": False
-                }
-                yield f"data: {json.dumps(response)}\n\n"
+            async for chunk in session.generate(prompt, stream=True, temperature=temperature):
+                response["created_at"] = now_iso()
+                response["response"] = chunk
+                yield sse_frame(response)
                 
             # Send done message
             response = {
                 "model": model_name,
-                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "created_at": now_iso(),
                 "done": True,
                 "context": [],
                 "total_duration": 1000000000,
                 "load_duration": 100000000
             }
-            yield f"data: {json.dumps(response)}\n\n"
+            yield sse_frame(response)
             
         except Exception as e:
             logger.error(f"Error during generation: {e}")
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield sse_frame({'error': str(e)})
             
     if stream:
-        return Response(
-            stream_with_context(generate()),
-            mimetype='text/event-stream',
+        return StreamingResponse(
+            generate(),
+            media_type='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
                 'X-Accel-Buffering': 'no'
             }
         )
     else:
-        # Non-streaming response
-        full_response = ""
-        for chunk in session.generate(prompt, stream=False):
-            full_response += chunk
+        # Non-streaming response (deterministic ones are served from the cache)
+        cache_key = response_cache_key(session.model_path, prompt, temperature)
+        full_response = _RESP_CACHE.get(cache_key) if cache_key else None
+        cached = full_response is not None
+        if not cached:
+            full_response = ""
+            async for chunk in session.generate(prompt, stream=False, temperature=temperature):
+                full_response += chunk
+            if cache_key:
+                _RESP_CACHE[cache_key] = full_response
             
-        return jsonify({
+        response = {
             "model": model_name,
-            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "created_at": now_iso(),
             "response": full_response,
             "done": True
-        })
+        }
+        if cached:
+            response["cached"] = True
+        return json_response(response)
 
-@app.route('/api/pull', methods=['POST'])
-def pull_model():
+@app.post('/api/pull')
+async def pull_model(request: Request):
     """Pull model endpoint (returns success for existing models)"""
-    data = request.get_json()
+    data = await read_json(request)
     model_name = data.get('name', '')
     
     # For embedding models, just return success
     # These models are not supported by llama.cpp but we pretend they exist
     # to prevent the backend from crashing
     if 'embed' in model_name.lower() or 'minilm' in model_name.lower():
-        return jsonify({
+        return json_response({
             "status": "success",
             "digest": hashlib.sha256(model_name.encode()).hexdigest()[:12],
             "note": "Embedding model simulated for compatibility"
@@ -613,34 +912,39 @@ def pull_model():
     
     model_path = get_model_path(model_name)
     if model_path:
-        return jsonify({
+        return json_response({
             "status": "success",
             "digest": hashlib.sha256(model_name.encode()).hexdigest()[:12]
         })
     else:
-        return jsonify({"error": f"Model {model_name} not found. Please download it first."}), 404
-
-@app.route('/api/embeddings', methods=['POST'])
-def generate_embeddings():
-    """Embeddings endpoint (stub for compatibility)"""
-    # This is a stub - llama.cpp doesn't directly support embeddings
-    # You'd need a separate embedding model for this
-    data = request.get_json()
+        return json_response({"error": f"Model {model_name} not found. Please download it first."}, status_code=404)
+
+@app.post('/api/embeddings')
+async def generate_embeddings(request: Request):
+    """Embeddings endpoint (Ollama compatible)"""
+    data = await read_json(request)
+    model_name = EMBED_MODEL or data.get('model', '')
     prompt = data.get('prompt', '')
     
-    # Return dummy embeddings for compatibility
-    import random
-    embedding = [random.random() for _ in range(384)]
+    # Embed with llama-server when the model is a local GGUF
+    try:
+        session = await get_or_create_session(model_name, True)
+        if session:
+            return json_response({"embedding": await session.embed(prompt)})
+        error = f"Embedding model {model_name} not found"
+    except Exception as e:
+        logger.error(f"Error generating embedding with {model_name}: {e}")
+        error = f"Embedding failed: {e}"
     
-    return jsonify({
-        "embedding": embedding
-    })
+    # Otherwise fail with a non-2xx status so callers fall back to their own embeddings
+    # (a placeholder vector would have the wrong dimension and a zero norm)
+    return json_response({"error": error}, status_code=503)
 
-@app.route('/health', methods=['GET'])
-@app.route('/api/health', methods=['GET'])
+@app.get('/health')
+@app.get('/api/health')
 def health():
     """Health check endpoint"""
-    return jsonify({
+    return json_response({
         "status": "ok",
         "gpu_enabled": True,
         "models_loaded": len(ACTIVE_SESSIONS),
@@ -650,13 +954,13 @@ def health():
 def cleanup():
     """Cleanup active sessions"""
     logger.info("Cleaning up active sessions...")
-    for session in ACTIVE_SESSIONS.values():
-        session.stop()
-    ACTIVE_SESSIONS.clear()
+    for sessions in (ACTIVE_SESSIONS, EMBED_SESSIONS):
+        for session in sessions.values():
+            session.stop()
+        sessions.clear()
 
 if __name__ == '__main__':
     import atexit
-    import signal
     
     try:
         logger.info("="*60)
@@ -667,17 +971,15 @@ if __name__ == '__main__':
         logger.info(f"Python version: {sys.version}")
         logger.info(f"Working directory: {os.getcwd()}")
         logger.info(f"Models directory: {MODELS_DIR}")
-        logger.info(f"llama.cpp binary: {LLAMA_BIN}")
+        logger.info(f"llama-server binary: {LLAMA_SERVER_BIN}")
         
         # Check if binary is executable
-        if not os.access(LLAMA_BIN, os.X_OK):
-            logger.error(f"Binary not executable: {LLAMA_BIN}")
+        if not os.access(LLAMA_SERVER_BIN, os.X_OK):
+            logger.error(f"Binary not executable: {LLAMA_SERVER_BIN}")
             sys.exit(1)
         
-        # Register cleanup
+        # Register cleanup (uvicorn handles SIGINT/SIGTERM and runs the lifespan shutdown)
         atexit.register(cleanup)
-        signal.signal(signal.SIGINT, lambda s, f: cleanup() or exit(0))
-        signal.signal(signal.SIGTERM, lambda s, f: cleanup() or exit(0))
         
         # Initial model scan
         logger.info("Scanning for models...")
@@ -692,8 +994,8 @@ if __name__ == '__main__':
         
         logger.info(f"Starting server on http://127.0.0.1:11434")
         
-        # Run server
-        app.run(host='127.0.0.1', port=11434, debug=False, threaded=True, use_reloader=False)
+        # Run server (uvicorn picks uvloop and httptools automatically when installed)
+        uvicorn.run(app, host='127.0.0.1', port=11434, loop='auto', http='auto')
         
     except Exception as e:
         logger.error(f"Failed to start GPU bridge: {e}")
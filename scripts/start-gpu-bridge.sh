@@ -21,7 +21,7 @@ fi
 
 # Check for required Python packages
 echo -e "${YELLOW}Checking Python dependencies...${NC}"
-pip_packages="flask flask-cors"
+pip_packages="fastapi uvicorn httpx"
 for package in $pip_packages; do
     if ! python3 -c "import $package" 2>/dev/null; then
         echo "Installing $package..."
@@ -56,9 +56,9 @@ check_prerequisites() {
     fi
     
     # Check Python packages
-    if ! python3 -c "import flask" 2>/dev/null; then
+    if ! python3 -c "import flask, requests" 2>/dev/null; then
         echo -e "${YELLOW}Installing Flask...${NC}"
-        pip install flask flask-cors
+        pip install flask flask-cors requests
     fi
     
     # Check Node.js
@@ -80,7 +80,8 @@ stop_services() {
     pkill -f "ollama serve" 2>/dev/null && echo "  - Stopped Ollama"
     
     # Stop GPU bridge
-    pkill -f "ollama-gpu-bridge-v2.py" 2>/dev/null && echo "  - Stopped GPU bridge"
+    pkill -f "ollama-gpu-bridge-v2.py|gpu_bridge_wsgi" 2>/dev/null && echo "  - Stopped GPU bridge"
+    pkill -f "nginx-gpu-bridge.conf" 2>/dev/null && echo "  - Stopped bridge proxy"
     
     # Stop backend
     pkill -f "npm run dev" 2>/dev/null && echo "  - Stopped backend"
@@ -96,21 +97,44 @@ start_gpu_bridge() {
     if [ -f "$HOME/.ollama/environment" ]; then
         source "$HOME/.ollama/environment"
         echo -e "${GREEN}✓ GPU configuration loaded${NC}"
-        echo "  GPU Layers: ${OLLAMA_GPU_LAYERS:-16}"
-        echo "  Threads: $(nproc)"
+        # The bridge only sees exported overrides; otherwise it tunes both per device/model
+        echo "  GPU Layers: $(printenv OLLAMA_GPU_LAYERS || echo "auto (per model)")"
+        echo "  Threads: $(printenv OLLAMA_NUM_THREAD || echo "auto (performance cores)")"
     fi
     
-    # Start the bridge in background (v2 - simplified version)
+    # When nginx is installed (pkg install nginx) it owns port 11434 and answers
+    # preflights and /health itself; the bridge moves behind it on 11435
     cd "$PROJECT_DIR"
-    nohup python3 scripts/ollama-gpu-bridge-v2.py \
-        > "$LOG_DIR/gpu-bridge.log" 2>&1 &
+    if command -v nginx >/dev/null 2>&1; then
+        export OLLAMA_BRIDGE_PORT=11435
+    else
+        export OLLAMA_BRIDGE_PORT=11434
+    fi
+    
+    # Start the bridge in background (v2 - persistent llama-server)
+    # Prefer gunicorn's gevent worker when installed (pip install gunicorn gevent);
+    # keep a single worker so models are only loaded once
+    if python3 -c "import gunicorn, gevent" 2>/dev/null; then
+        nohup gunicorn -k gevent -w 1 --worker-connections 64 \
+            -b 127.0.0.1:$OLLAMA_BRIDGE_PORT --chdir scripts gpu_bridge_wsgi:app \
+            > "$LOG_DIR/gpu-bridge.log" 2>&1 &
+    else
+        nohup python3 scripts/ollama-gpu-bridge-v2.py \
+            > "$LOG_DIR/gpu-bridge.log" 2>&1 &
+    fi
     
     echo $! > "$PID_DIR/gpu-bridge.pid"
     
-    # Wait for bridge to be ready
+    if [ "$OLLAMA_BRIDGE_PORT" != "11434" ] && ! pgrep -f "nginx-gpu-bridge.conf" > /dev/null; then
+        mkdir -p "$PROJECT_DIR/tmp"
+        nginx -p "$PROJECT_DIR" -c scripts/nginx-gpu-bridge.conf
+        echo -e "${GREEN}✓ nginx proxy started on port 11434${NC}"
+    fi
+    
+    # Wait for bridge to be ready (ask the bridge itself, nginx answers /health alone)
     echo -n "Waiting for GPU bridge..."
     for i in {1..10}; do
-        if curl -s http://127.0.0.1:11434/health >/dev/null 2>&1; then
+        if curl -s http://127.0.0.1:$OLLAMA_BRIDGE_PORT/api/health >/dev/null 2>&1; then
             echo -e " ${GREEN}ready!${NC}"
             return 0
         fi
@@ -186,7 +210,7 @@ monitor_services() {
     
     while true; do
         # Check if services are running
-        if ! pgrep -f "ollama-gpu-bridge-v2.py" > /dev/null; then
+        if ! pgrep -f "ollama-gpu-bridge-v2.py|gpu_bridge_wsgi" > /dev/null; then
             echo -e "\n${RED}GPU Bridge stopped! Restarting...${NC}"
             start_gpu_bridge
         fi